@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+
+import json
+import time
+import random
+import hashlib
+import threading
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Sizes of the synthetic images served for posters, backdrops and previews
+POSTER_SIZE = 24 * 1024
+BACKDROP_SIZE = 96 * 1024
+PREVIEW_SIZE = 600
+
+GENRES = ["Action", "Adventure", "Comedy", "Drama", "Documentary", "Fantasy",
+          "Horror", "Mystery", "Romance", "Science Fiction", "Thriller", "Western"]
+STUDIOS = ["Northwind Pictures", "Blue Harbor", "Silverline", "Kestrel Films", "Orbit Media"]
+RATINGS = ["G", "PG", "PG-13", "R", "TV-14", "TV-MA"]
+
+class SyntheticLibrary:
+    """Deterministic synthetic movie and TV library shared by the Plex and Jellyfin APIs"""
+
+    def __init__(self, size=1000, show_ratio=0.2, episodes_per_show=40, cast_size=20, seed=1):
+        self.size = size
+        self.show_count = int(size * show_ratio)
+        self.movie_count = size - self.show_count
+        self.episodes_per_show = episodes_per_show
+        self.seasons_per_show = max(1, min(10, episodes_per_show // 10))
+        self.cast_size = cast_size
+        self.seed = seed
+        # Bumping the revision changes every image, simulating a library wide artwork refresh
+        self.revision = 0
+
+        rng = random.Random(seed)
+        self.templates = {
+            'poster': rng.randbytes(POSTER_SIZE),
+            'backdrop': rng.randbytes(BACKDROP_SIZE),
+            'preview': rng.randbytes(PREVIEW_SIZE)
+        }
+
+    def item_ids(self, media_type):
+        """Return the IDs of all items of a media type"""
+        if media_type == 'movie':
+            return range(1, self.movie_count + 1)
+        return range(self.movie_count + 1, self.size + 1)
+
+    def media_type(self, item_id):
+        """Return 'movie' or 'tvshow' for an item ID"""
+        return 'movie' if item_id <= self.movie_count else 'tvshow'
+
+    def item(self, item_id):
+        """Return the server neutral description of an item"""
+        rng = random.Random(self.seed * 1000003 + item_id)
+        return {
+            'id': item_id,
+            'type': self.media_type(item_id),
+            'title': f"Synthetic Title {item_id:05d}",
+            'year': 1950 + item_id % 75,
+            'summary': " ".join(f"word{rng.randint(0, 9999)}" for _ in range(60)),
+            'rating': round(rng.uniform(1, 10), 1),
+            'studio': STUDIOS[item_id % len(STUDIOS)],
+            'genres': rng.sample(GENRES, 3),
+            'content_rating': RATINGS[item_id % len(RATINGS)],
+            'added_at': 1600000000 + item_id * 3600,
+            'duration': 5400000 + item_id % 3600 * 1000,
+            'cast': [(f"Actor {rng.randint(1, 5000)}", f"Role {n}") for n in range(self.cast_size)],
+            'imdb': f"tt{9000000 + item_id}",
+            'tmdb': str(100000 + item_id)
+        }
+
+    def image(self, kind, item_id):
+        """Return the bytes of a synthetic image, unique per item, kind and revision"""
+        header = f"{kind}:{item_id}:{self.revision}:".encode('ascii')
+        return header + self.templates[kind]
+
+
+class MockMediaServer:
+    """Local stand-in for a Plex and a Jellyfin/Emby server with latency and error injection"""
+
+    def __init__(self, library, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0, seed=1):
+        self.library = library
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, avoid delayed ACK stalls on keep-alive
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                server.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {'requests': 0, 'bytes': 0, 'errors': 0, 'endpoints': {}}
+
+    def record(self, endpoint, size, error=False):
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['bytes'] += size
+            self.stats['errors'] += int(error)
+            self.stats['endpoints'][endpoint] = self.stats['endpoints'].get(endpoint, 0) + 1
+
+    def handle(self, handler):
+        """Route a request to the Plex or Jellyfin API implementation"""
+        if self.latency:
+            time.sleep(self.latency)
+
+        parsed = urlparse(handler.path)
+        params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        parts = [part for part in parsed.path.split('/') if part]
+
+        with self.lock:
+            fail = self.error_rate and self.rng.random() < self.error_rate
+        if fail:
+            self.send(handler, 500, b'{"error": "injected failure"}', 'application/json', "error", error=True)
+            return
+
+        try:
+            route = self.route_plex(parts, params) if parts and parts[0] in ('library', 'photo') \
+                else self.route_jellyfin(parts, params)
+        except (ValueError, KeyError, IndexError):
+            route = None
+
+        if route is None:
+            self.send(handler, 404, b'{"error": "not found"}', 'application/json', "not_found")
+            return
+
+        endpoint, body = route
+        if isinstance(body, bytes):
+            self.send(handler, 200, body, 'image/jpeg', endpoint)
+        else:
+            self.send(handler, 200, json.dumps(body).encode('utf-8'), 'application/json', endpoint)
+
+    def send(self, handler, status, body, content_type, endpoint, error=False):
+        handler.send_response(status)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+        self.record(endpoint, len(body), error)
+
+    # Plex API
+
+    def plex_item(self, item_id, detailed=False):
+        item = self.library.item(item_id)
+        metadata = {
+            'ratingKey': str(item_id),
+            'key': f"/library/metadata/{item_id}",
+            'type': 'movie' if item['type'] == 'movie' else 'show',
+            'title': item['title'],
+            'year': item['year'],
+            'summary': item['summary'],
+            'rating': item['rating'],
+            'studio': item['studio'],
+            'contentRating': item['content_rating'],
+            'addedAt': item['added_at'],
+            'updatedAt': item['added_at'] + self.library.revision,
+            'thumb': f"/library/metadata/{item_id}/thumb/{self.library.revision}",
+            'art': f"/library/metadata/{item_id}/art/{self.library.revision}",
+            'Genre': [{'tag': genre} for genre in item['genres']]
+        }
+        if item['type'] == 'movie':
+            metadata['duration'] = item['duration']
+        else:
+            metadata['leafCount'] = self.library.episodes_per_show
+            metadata['childCount'] = self.library.seasons_per_show
+        if detailed:
+            metadata['Role'] = [{'tag': name, 'role': role} for name, role in item['cast']]
+            metadata['Guid'] = [{'id': f"imdb://{item['imdb']}"}, {'id': f"tmdb://{item['tmdb']}"}]
+        return metadata
+
+    def route_plex(self, parts, params):
+        library = self.library
+        if parts[0] == 'photo':
+            return "plex_transcode", library.image('preview', 0)
+
+        if parts[:2] == ['library', 'sections'] and len(parts) == 2:
+            return "plex_sections", {'MediaContainer': {'Directory': [
+                {'key': '1', 'type': 'movie', 'title': 'Movies'},
+                {'key': '2', 'type': 'show', 'title': 'TV Shows'}
+            ]}}
+
+        if parts[:2] == ['library', 'sections'] and len(parts) == 4 and parts[3] == 'all':
+            ids = library.item_ids('movie' if parts[2] == '1' else 'tvshow')
+            start = int(params.get('X-Plex-Container-Start', 0))
+            size = int(params.get('X-Plex-Container-Size', 50))
+            page = ids[start:start + size]
+            return "plex_list", {'MediaContainer': {
+                'totalSize': len(ids),
+                'size': len(page),
+                'Metadata': [self.plex_item(item_id) for item_id in page]
+            }}
+
+        if parts[:2] == ['library', 'metadata']:
+            key = parts[2]
+            if len(parts) == 3:
+                return "plex_detail", {'MediaContainer': {'Metadata': [self.plex_item(int(key), detailed=True)]}}
+            if parts[3] in ('thumb', 'art'):
+                return f"plex_{parts[3]}", library.image('poster' if parts[3] == 'thumb' else 'backdrop', int(key))
+            if parts[3] == 'cast':
+                cast = library.item(int(key))['cast']
+                return "plex_cast", {'MediaContainer': {'Metadata': [{'tag': n, 'role': r} for n, r in cast]}}
+            if parts[3] == 'children':
+                return "plex_children", {'MediaContainer': {'Metadata': self.plex_children(key)}}
+            if parts[3] == 'allLeaves':
+                episodes = [dict(episode, parentRatingKey=season['ratingKey'])
+                            for season in self.plex_children(key)
+                            for episode in self.plex_children(season['ratingKey'])]
+                return "plex_all_leaves", {'MediaContainer': {'Metadata': episodes}}
+        return None
+
+    def plex_children(self, key):
+        """Return the seasons of a show or the episodes of a season"""
+        library = self.library
+        if '-' not in key:
+            return [{
+                'ratingKey': f"{key}-{season}",
+                'type': 'season',
+                'index': season,
+                'title': f"Season {season}",
+                'leafCount': library.episodes_per_show // library.seasons_per_show
+            } for season in range(1, library.seasons_per_show + 1)]
+
+        show, season = key.split('-')
+        per_season = library.episodes_per_show // library.seasons_per_show
+        return [{
+            'ratingKey': f"{show}-{season}-{episode}",
+            'type': 'episode',
+            'index': episode,
+            'parentIndex': int(season),
+            'title': f"Episode {episode}",
+            'summary': f"Synthetic episode {episode} of season {season}",
+            'duration': 2700000,
+            'originallyAvailableAt': "2020-01-01"
+        } for episode in range(1, per_season + 1)]
+
+    # Jellyfin / Emby API
+
+    def jellyfin_item(self, item_id):
+        item = self.library.item(item_id)
+        tag = hashlib.md5(f"{item_id}:{self.library.revision}".encode('ascii')).hexdigest()
+        data = {
+            'Id': f"{item_id:032x}",
+            'Name': item['title'],
+            'Type': 'Movie' if item['type'] == 'movie' else 'Series',
+            'ProductionYear': item['year'],
+            'Overview': item['summary'],
+            'CommunityRating': item['rating'],
+            'OfficialRating': item['content_rating'],
+            'Studios': [{'Name': item['studio']}],
+            'Genres': item['genres'],
+            'People': [{'Name': name, 'Role': role, 'Type': 'Actor'} for name, role in item['cast']],
+            'DateCreated': time.strftime('%Y-%m-%dT%H:%M:%S.0000000Z', time.gmtime(item['added_at'])),
+            'PremiereDate': f"{item['year']}-01-01T00:00:00.0000000Z",
+            'ProviderIds': {'Imdb': item['imdb'], 'Tmdb': item['tmdb']},
+            'ImageTags': {'Primary': tag},
+            'BackdropImageTags': [tag],
+            'UserData': {'PlaybackPositionTicks': 0, 'PlayCount': 0, 'IsFavorite': False, 'Played': False}
+        }
+        if item['type'] == 'movie':
+            data['RunTimeTicks'] = item['duration'] * 10000
+        return data
+
+    def jellyfin_episodes(self, item_id, season=None):
+        library = self.library
+        per_season = library.episodes_per_show // library.seasons_per_show
+        seasons = [season] if season else range(1, library.seasons_per_show + 1)
+        return [{
+            'Id': f"{item_id:016x}{season_number:08x}{episode:08x}",
+            'Name': f"Episode {episode}",
+            'Type': 'Episode',
+            'IndexNumber': episode,
+            'ParentIndexNumber': season_number,
+            'Overview': f"Synthetic episode {episode} of season {season_number}",
+            'RunTimeTicks': 27000000000,
+            'PremiereDate': "2020-01-01T00:00:00.0000000Z"
+        } for season_number in seasons for episode in range(1, per_season + 1)]
+
+    def route_jellyfin(self, parts, params):
+        library = self.library
+        if parts == ['Users']:
+            return "jellyfin_users", [{'Id': 'user1', 'Name': 'benchmark'}]
+
+        if len(parts) == 3 and parts[0] == 'Users' and parts[2] == 'Views':
+            return "jellyfin_views", {'Items': [
+                {'Id': 'lib-movies', 'Name': 'Movies', 'CollectionType': 'movies'},
+                {'Id': 'lib-tvshows', 'Name': 'TV Shows', 'CollectionType': 'tvshows'}
+            ]}
+
+        if len(parts) == 3 and parts[0] == 'Users' and parts[2] == 'Items':
+            types = params.get('IncludeItemTypes', 'Movie,Series').split(',')
+            parent = params.get('ParentId')
+            ids = []
+            if 'Movie' in types and parent in (None, 'lib-movies'):
+                ids.extend(library.item_ids('movie'))
+            if 'Series' in types and parent in (None, 'lib-tvshows'):
+                ids.extend(library.item_ids('tvshow'))
+            start = int(params.get('StartIndex', 0))
+            limit = int(params.get('Limit', len(ids)))
+            items = [self.jellyfin_item(item_id) for item_id in ids[start:start + limit]]
+            if params.get('EnableUserData') == 'false':
+                for item in items:
+                    del item['UserData']
+            body = {'Items': items, 'StartIndex': start}
+            if params.get('EnableTotalRecordCount', 'true') != 'false':
+                body['TotalRecordCount'] = len(ids)
+            return "jellyfin_list", body
+
+        if len(parts) == 3 and parts[0] == 'Shows':
+            item_id = int(parts[1], 16)
+            if parts[2] == 'Seasons':
+                return "jellyfin_seasons", {'Items': [
+                    {'Id': f"{item_id:016x}{season:08x}", 'Name': f"Season {season}", 'IndexNumber': season}
+                    for season in range(1, library.seasons_per_show + 1)
+                ]}
+            if parts[2] == 'Episodes':
+                season = params.get('SeasonId')
+                episodes = self.jellyfin_episodes(item_id, int(season[16:], 16) if season else None)
+                start = int(params.get('StartIndex', 0))
+                limit = int(params.get('Limit', len(episodes)))
+                return "jellyfin_episodes", {'Items': episodes[start:start + limit], 'TotalRecordCount': len(episodes)}
+
+        if len(parts) >= 4 and parts[0] == 'Items' and parts[2] == 'Images':
+            item_id = int(parts[1], 16)
+            if 'maxWidth' in params:
+                return "jellyfin_preview", library.image('preview', item_id)
+            kind = 'poster' if parts[3] == 'Primary' else 'backdrop'
+            return f"jellyfin_{kind}", library.image(kind, item_id)
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local mock Plex and Jellyfin/Emby server')
+    parser.add_argument('--port', type=int, default=32400, help='Port to listen on (default: 32400)')
+    parser.add_argument('--size', type=int, default=1000, help='Number of movies and shows (default: 1000)')
+    parser.add_argument('--episodes-per-show', type=int, default=40, help='Episodes per show (default: 40)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Added latency per request in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests failing with HTTP 500')
+    args = parser.parse_args()
+
+    library = SyntheticLibrary(args.size, episodes_per_show=args.episodes_per_show)
+    server = MockMediaServer(library, port=args.port, latency=args.latency, error_rate=args.error_rate)
+    print(f"Mock media server with {args.size} items listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
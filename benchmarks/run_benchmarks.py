@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import subprocess
+from pathlib import Path
+from mock_media_server import SyntheticLibrary, MockMediaServer
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+SCRIPTS_DIR = BENCHMARK_DIR.parent / "scripts"
+BASELINES_FILE = BENCHMARK_DIR / "baselines.json"
+
+# Library profiles: total items (80% movies, 20% shows) and episodes per show
+PROFILES = {
+    'small': {'size': 1000, 'episodes_per_show': 40},
+    'medium': {'size': 10000, 'episodes_per_show': 60},
+    'large': {'size': 50000, 'episodes_per_show': 80}
+}
+
+FETCHERS = {
+    'plex': SCRIPTS_DIR / "plex_data_fetcher.py",
+    'jellyfin': SCRIPTS_DIR / "jellyfin_data_fetcher.py"
+}
+
+# Allowed regression over the stored baseline for each metric. Peak RSS varies a
+# little between machines and Python builds, so its tolerance is loose
+TOLERANCES = {
+    'requests': 0.02,
+    'bytes': 0.05,
+    'peak_rss_kb': 0.5
+}
+
+# Wall time depends on the machine the baselines were stored on; only compared with --gate-timing
+TIMING_TOLERANCES = {
+    'wall_time': 0.5
+}
+
+# Runs of each scenario, in order. The artwork refresh changes every image on the
+# server before it runs, so unchanged images cannot be skipped
+RUNS = ('full', 'no-change', 'artwork-refresh')
+
+def run_fetcher(server_type, server, output_dir, log_file, throttle):
+    """Run one fetcher against the mock server in a child process and measure it"""
+    command = [sys.executable, str(BENCHMARK_DIR / "fetcher_bootstrap.py")]
+    if not throttle:
+        command.append('--no-throttle')
+    command += [str(FETCHERS[server_type]), '--url', server.url, '--token', 'benchmark', '--output', str(output_dir)]
+
+    server.reset_stats()
+    start = time.perf_counter()
+    with open(log_file, 'a') as log:
+        process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(process.pid, 0)
+    wall_time = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    if process.returncode != 0:
+        raise RuntimeError(f"{server_type} fetcher exited with {process.returncode}, see {log_file}")
+
+    return {
+        'wall_time': round(wall_time, 2),
+        'requests': server.stats['requests'],
+        'bytes': server.stats['bytes'],
+        'peak_rss_kb': usage.ru_maxrss,
+        'errors': server.stats['errors'],
+        'endpoints': dict(sorted(server.stats['endpoints'].items()))
+    }
+
+def run_scenario(server_type, profile, args, work_dir):
+    """Run a full sync, a no-change sync and an artwork refresh for one server type and library profile"""
+    library = SyntheticLibrary(**PROFILES[profile])
+    server = MockMediaServer(library, latency=args.latency, error_rate=args.error_rate).start()
+    output_dir = work_dir / f"{server_type}-{profile}"
+    log_file = work_dir / f"{server_type}-{profile}.log"
+
+    results = {}
+    try:
+        for run in RUNS:
+            if run == 'artwork-refresh':
+                library.revision += 1
+            print(f"Running {server_type}/{profile}/{run} ({library.size} items)...", flush=True)
+            results[f"{server_type}/{profile}/{run}"] = run_fetcher(server_type, server, output_dir, log_file, args.throttle)
+    finally:
+        server.stop()
+    return results
+
+def compare(results, baselines, tolerances):
+    """Return a list of metrics that regressed beyond their tolerance"""
+    failures = []
+    for name, metrics in results.items():
+        baseline = baselines.get(name)
+        if not baseline:
+            print(f"  {name}: no baseline stored")
+            continue
+        for metric, tolerance in tolerances.items():
+            if metric not in baseline:
+                print(f"  {name}: no {metric} baseline stored")
+                continue
+            limit = baseline[metric] * (1 + tolerance)
+            if metrics[metric] > limit:
+                failures.append(f"{name}: {metric} {metrics[metric]} exceeds baseline {baseline[metric]} (+{tolerance:.0%})")
+    return failures
+
+def print_report(results):
+    print(f"\n{'Scenario':<32} {'Wall (s)':>9} {'Requests':>10} {'Bytes':>14} {'Peak RSS (KB)':>14}")
+    for name, metrics in results.items():
+        print(f"{name:<32} {metrics['wall_time']:>9.2f} {metrics['requests']:>10} "
+              f"{metrics['bytes']:>14} {metrics['peak_rss_kb']:>14}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the fetchers against a local mock media server')
+    parser.add_argument('--servers', nargs='*', default=list(FETCHERS), choices=list(FETCHERS),
+                        help='Fetchers to benchmark (default: plex jellyfin)')
+    parser.add_argument('--profiles', nargs='*', default=['small'], choices=list(PROFILES),
+                        help='Library profiles to run (default: small)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Added latency per request in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests failing with HTTP 500')
+    parser.add_argument('--throttle', action='store_true', help="Keep the fetchers' fixed sleeps between requests")
+    parser.add_argument('--update-baselines', action='store_true', help='Store these results as the new baselines')
+    parser.add_argument('--gate-timing', action='store_true',
+                        help='Also fail on wall time regressions, for baselines stored on this machine')
+    parser.add_argument('--keep', action='store_true', help='Keep the output and logs of the runs')
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="glimpse-benchmark-"))
+    results = {}
+    try:
+        for profile in args.profiles:
+            for server_type in args.servers:
+                results.update(run_scenario(server_type, profile, args, work_dir))
+    finally:
+        if args.keep:
+            print(f"Benchmark output kept in: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(results)
+
+    baselines = {}
+    if BASELINES_FILE.exists():
+        with open(BASELINES_FILE, 'r') as f:
+            baselines = json.load(f)
+
+    # Baselines only make sense for the default conditions
+    if args.latency or args.error_rate or args.throttle:
+        print("\nNon-default latency, error rate or throttling - not comparing against baselines")
+        return
+
+    if args.update_baselines:
+        for name, metrics in results.items():
+            baselines[name] = {metric: metrics[metric] for metric in {**TOLERANCES, **TIMING_TOLERANCES}}
+        with open(BASELINES_FILE, 'w') as f:
+            json.dump(dict(sorted(baselines.items())), f, indent=2)
+            f.write("\n")
+        print(f"\nBaselines updated: {BASELINES_FILE}")
+        return
+
+    failures = compare(results, baselines, {**TOLERANCES, **(TIMING_TOLERANCES if args.gate_timing else {})})
+    if failures:
+        print("\nPerformance regressions:")
+        for failure in failures:
+            print(f"  ✗ {failure}")
+        sys.exit(1)
+    print("\n✓ All scenarios within baseline")
+
+if __name__ == "__main__":
+    main()
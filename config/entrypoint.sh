@@ -92,20 +92,87 @@ echo "Default sort by date added: $SORT_BY_DATE_ADDED"
 PYTHON_PATH=$(which python)
 echo "Python path: $PYTHON_PATH"
 
+# Log level of the sync scripts - cron does not see container env vars, so pass it as an argument
+LOG_LEVEL=${LOG_LEVEL:-"INFO"}
+LOG_ARGS=" --log-level $LOG_LEVEL"
+echo "Sync log level: $LOG_LEVEL"
+
+# Prioritized sync publishes the catalog in milestones: newest posters, remaining posters, then backdrops and details
+PRIORITIZED_SYNC=${PRIORITIZED_SYNC:-"false"}
+PRIORITY_ARGS=""
+if [ "$PRIORITIZED_SYNC" = "true" ]; then
+    echo "Prioritized sync enabled (first publish after ${PRIORITY_ITEMS:-200} newest posters)"
+    PRIORITY_ARGS=" --prioritized --priority-items ${PRIORITY_ITEMS:-200}"
+fi
+
+# Lazy images: the fetchers only record backdrops (or all images) and the image proxy fetches them on first view
+LAZY_IMAGES=${LAZY_IMAGES:-"off"}
+LAZY_ARGS=""
+if [ "$LAZY_IMAGES" != "off" ]; then
+    echo "Lazy images enabled for: $LAZY_IMAGES (image cache limit: ${IMAGE_CACHE_MB:-1024} MiB)"
+    LAZY_ARGS=" --lazy-images $LAZY_IMAGES"
+fi
+
+# Libraries that fail to sync keep their last complete data and are retried after these delays (seconds)
+LIBRARY_RETRY_DELAYS=${LIBRARY_RETRY_DELAYS:-"30,90"}
+RETRY_ARGS=" --retry-delays $LIBRARY_RETRY_DELAYS"
+
+# Every publish writes the changes against the previous catalog generation, kept for this many generations
+CHANGE_GENERATIONS=${CHANGE_GENERATIONS:-"20"}
+CHANGE_ARGS=" --change-generations $CHANGE_GENERATIONS"
+
+# Columnar catalogs: an additional copy of each catalog stored one array per field, for very large libraries
+COLUMNAR_CATALOG=${COLUMNAR_CATALOG:-"false"}
+COLUMNAR_ARGS=""
+if [ "$COLUMNAR_CATALOG" = "true" ]; then
+    echo "Columnar catalogs enabled"
+    COLUMNAR_ARGS=" --columnar"
+fi
+
+# Optional cross-server merge: deduplicate titles by provider IDs into /app/data/merged
+MERGE_CATALOGS=${MERGE_CATALOGS:-"false"}
+MERGE_SERVERS=${MERGE_SERVERS:-"plex,jellyfin,emby"}
+SHARED_ARTWORK_ARGS=""
+MERGE_COMMAND=""
+if [ "$MERGE_CATALOGS" = "true" ]; then
+    echo "Cross-server catalog merge enabled (artwork preference: $MERGE_SERVERS)"
+    SHARED_ARTWORK_ARGS=" --shared-artwork-index /app/data/merged/artwork_index.json --shared-artwork-servers $MERGE_SERVERS"
+    MERGE_COMMAND="$PYTHON_PATH /app/scripts/catalog_merger.py --data-dir /app/data --output /app/data/merged --servers ${MERGE_SERVERS//,/ }$LOG_ARGS$CHANGE_ARGS$COLUMNAR_ARGS"
+fi
+
+# Per-library refresh intervals, e.g. "New Releases=1h,Archive=7d" - CRON_SCHEDULE then only decides how often
+# the fetchers check which libraries are due, libraries without an interval are still synced on every run
+for server in PLEX JELLYFIN EMBY; do
+    intervals_var="${server}_LIBRARY_INTERVALS"
+    if [ -n "${!intervals_var}" ]; then
+        echo "Library refresh intervals for $server: ${!intervals_var}"
+    fi
+done
+
+# Options shared by every fetcher run, scheduled or initial
+FETCH_ARGS="$SHARED_ARTWORK_ARGS$LOG_ARGS$PRIORITY_ARGS$LAZY_ARGS$RETRY_ARGS$CHANGE_ARGS$COLUMNAR_ARGS"
+
 # Create the cron job with PATH
 echo "PATH=/usr/local/bin:/usr/bin:/bin:/sbin:/usr/sbin" >/etc/cron.d/media-cron
 
+# Each fetch is followed by a merge when enabled; merges started together by the same schedule
+# wait for each other (catalog_merger.py holds a lock on the merged output while it writes)
+MERGE_CRON_SUFFIX=""
+if [ -n "$MERGE_COMMAND" ]; then
+    MERGE_CRON_SUFFIX=" && $MERGE_COMMAND >> /var/log/cron.log 2>&1"
+fi
+
 # Add cron jobs for each configured server
 if [ -n "$PLEX_URL" ] && [ -n "$PLEX_TOKEN" ]; then
-    echo "$CRON_SCHEDULE root cd /app && $PYTHON_PATH /app/scripts/plex_data_fetcher.py --url \"$PLEX_URL\" --token \"$PLEX_TOKEN\" --output /app/data/plex >> /var/log/cron.log 2>&1" >>/etc/cron.d/media-cron
+    echo "$CRON_SCHEDULE root cd /app && $PYTHON_PATH /app/scripts/plex_data_fetcher.py --url \"$PLEX_URL\" --token \"$PLEX_TOKEN\" --output /app/data/plex$FETCH_ARGS${PLEX_LIBRARY_INTERVALS:+ --library-intervals \"$PLEX_LIBRARY_INTERVALS\"} >> /var/log/cron.log 2>&1$MERGE_CRON_SUFFIX" >>/etc/cron.d/media-cron
 fi
 
 if [ -n "$JELLYFIN_URL" ] && [ -n "$JELLYFIN_TOKEN" ]; then
-    echo "$CRON_SCHEDULE root cd /app && $PYTHON_PATH /app/scripts/jellyfin_data_fetcher.py --url \"$JELLYFIN_URL\" --token \"$JELLYFIN_TOKEN\" --output /app/data/jellyfin >> /var/log/cron.log 2>&1" >>/etc/cron.d/media-cron
+    echo "$CRON_SCHEDULE root cd /app && $PYTHON_PATH /app/scripts/jellyfin_data_fetcher.py --url \"$JELLYFIN_URL\" --token \"$JELLYFIN_TOKEN\" --output /app/data/jellyfin$FETCH_ARGS${JELLYFIN_LIBRARY_INTERVALS:+ --library-intervals \"$JELLYFIN_LIBRARY_INTERVALS\"} >> /var/log/cron.log 2>&1$MERGE_CRON_SUFFIX" >>/etc/cron.d/media-cron
 fi
 
 if [ -n "$EMBY_URL" ] && [ -n "$EMBY_TOKEN" ]; then
-    echo "$CRON_SCHEDULE root cd /app && $PYTHON_PATH /app/scripts/jellyfin_data_fetcher.py --url \"$EMBY_URL\" --token \"$EMBY_TOKEN\" --output /app/data/emby >> /var/log/cron.log 2>&1" >>/etc/cron.d/media-cron
+    echo "$CRON_SCHEDULE root cd /app && $PYTHON_PATH /app/scripts/jellyfin_data_fetcher.py --url \"$EMBY_URL\" --token \"$EMBY_TOKEN\" --output /app/data/emby$FETCH_ARGS${EMBY_LIBRARY_INTERVALS:+ --library-intervals \"$EMBY_LIBRARY_INTERVALS\"} >> /var/log/cron.log 2>&1$MERGE_CRON_SUFFIX" >>/etc/cron.d/media-cron
 fi
 
 # Apply cron job
@@ -166,6 +233,7 @@ migrate_existing_data
 mkdir -p /app/web/plex
 mkdir -p /app/web/jellyfin
 mkdir -p /app/web/emby
+mkdir -p /app/web/merged
 
 # Function to create themed offline.html
 create_themed_offline() {
@@ -1043,6 +1111,12 @@ create_server_index() {
         clean_title=$(echo "$current_title" | sed 's/ - Jellyfin//g' | sed 's/ - Plex//g' | sed 's/ - Emby//g')
         sed -i "s|<title>.*</title>|<title>$clean_title - Emby</title>|" "$output_file"
         echo "Set Emby secondary route title: $clean_title - Emby"
+    elif [[ "$output_file" == *"/merged/index.html" ]]; then
+        # This is the route of the merged catalog of all servers
+        current_title=$(grep -o '<title>[^<]*</title>' "$output_file" | sed 's/<title>\(.*\)<\/title>/\1/')
+        clean_title=$(echo "$current_title" | sed 's/ - Jellyfin//g' | sed 's/ - Plex//g' | sed 's/ - Emby//g')
+        sed -i "s|<title>.*</title>|<title>$clean_title - All Servers</title>|" "$output_file"
+        echo "Set merged route title: $clean_title - All Servers"
     fi
 
     # For sub-directory routes, we need to use relative paths from the sub-directory
@@ -1120,6 +1194,13 @@ configure_multi_server_dropdown() {
         create_server_index "emby" "data/emby" "/app/web/emby/index.html"
     fi
 
+    # Merged catalog of all servers (MERGE_CATALOGS=true), published by catalog_merger.py to data/merged
+    if [ "$MERGE_CATALOGS" = "true" ]; then
+        create_server_index "merged" "data/merged" "/app/web/merged/index.html"
+    else
+        rm -f /app/web/merged/index.html
+    fi
+
     # Replace toggle button with dropdown for all routes
     replace_toggle_with_dropdown "/app/web/index.html" "$PRIMARY_SERVER"
 
@@ -1132,6 +1213,9 @@ configure_multi_server_dropdown() {
     if [ -f "/app/web/emby/index.html" ]; then
         replace_toggle_with_dropdown "/app/web/emby/index.html" "emby"
     fi
+    if [ -f "/app/web/merged/index.html" ]; then
+        replace_toggle_with_dropdown "/app/web/merged/index.html" "merged"
+    fi
 }
 
 # Function to replace toggle button with dropdown
@@ -1163,6 +1247,9 @@ replace_toggle_with_dropdown() {
     elif [[ "$index_file" == *"/emby/index.html" ]]; then
         current_path="/emby/"
         icon_base_path="../images/icons/"
+    elif [[ "$index_file" == *"/merged/index.html" ]]; then
+        current_path="/merged/"
+        icon_base_path="../images/icons/"
     fi
 
     # Add options for all configured servers
@@ -1256,6 +1343,25 @@ replace_toggle_with_dropdown() {
         dropdown_items="$dropdown_items<div class=\"server-item$emby_active\" data-path=\"$emby_relative_path\"><img src=\"${icon_base_path}emby.png\" alt=\"Emby\" class=\"server-icon-img\"> Emby</div>"
     fi
 
+    if [ "$MERGE_CATALOGS" = "true" ]; then
+        local merged_relative_path=""
+
+        if [[ "$index_file" == "/app/web/index.html" ]]; then
+            merged_relative_path="merged/"
+        else
+            merged_relative_path="../merged/"
+        fi
+
+        local merged_active=""
+        if [ "$current_server" = "merged" ]; then
+            merged_active=" active"
+            current_server_display="All Servers"
+            current_server_icon="<img src=\"${icon_base_path}../glimpse-icon.png\" alt=\"All Servers\" class=\"server-icon-img\">"
+        fi
+
+        dropdown_items="$dropdown_items<div class=\"server-item$merged_active\" data-path=\"$merged_relative_path\"><img src=\"${icon_base_path}../glimpse-icon.png\" alt=\"All Servers\" class=\"server-icon-img\"> All Servers</div>"
+    fi
+
     # Create a temporary file with the server dropdown content
     cat >/tmp/server_dropdown_content.html <<EOF
 
@@ -1709,7 +1815,7 @@ fix_corrupted_files() {
     echo "Checking for and fixing any files with duplicate server content..."
 
     # Check all HTML files for multiple server dropdown sections
-    for file in /app/web/index.html /app/web/plex/index.html /app/web/jellyfin/index.html /app/web/emby/index.html; do
+    for file in /app/web/index.html /app/web/plex/index.html /app/web/jellyfin/index.html /app/web/emby/index.html /app/web/merged/index.html; do
         if [ -f "$file" ]; then
             # Count how many server drawer overlays exist
             drawer_count=$(grep -c "<!-- Server Drawer Overlay" "$file" 2>/dev/null || echo "0")
@@ -1857,6 +1963,15 @@ if [ -f /app/web/index.html ]; then
         if [ -f "/app/web/emby/index.html" ]; then
             apply_emby_theme "/app/web/emby/index.html"
         fi
+
+        # The merged route follows the theme of the primary server
+        if [ -f "/app/web/merged/index.html" ]; then
+            if [ "$PRIMARY_SERVER" = "jellyfin" ]; then
+                apply_jellyfin_theme "/app/web/merged/index.html"
+            elif [ "$PRIMARY_SERVER" = "emby" ]; then
+                apply_emby_theme "/app/web/merged/index.html"
+            fi
+        fi
     fi
 
     echo "Configuration updated successfully"
@@ -1883,19 +1998,22 @@ echo "Running initial data fetch"
 # Fetch Plex data if configured
 if [ -n "$PLEX_URL" ] && [ -n "$PLEX_TOKEN" ]; then
     echo "Fetching Plex data"
-    $PYTHON_PATH /app/scripts/plex_data_fetcher.py --url "$PLEX_URL" --token "$PLEX_TOKEN" --output /app/data/plex
+    $PYTHON_PATH /app/scripts/plex_data_fetcher.py --url "$PLEX_URL" --token "$PLEX_TOKEN" --output /app/data/plex $FETCH_ARGS ${PLEX_LIBRARY_INTERVALS:+--library-intervals "$PLEX_LIBRARY_INTERVALS"}
+    $MERGE_COMMAND
 fi
 
 # Fetch Jellyfin data if configured
 if [ -n "$JELLYFIN_URL" ] && [ -n "$JELLYFIN_TOKEN" ]; then
     echo "Fetching Jellyfin data"
-    $PYTHON_PATH /app/scripts/jellyfin_data_fetcher.py --url "$JELLYFIN_URL" --token "$JELLYFIN_TOKEN" --output /app/data/jellyfin
+    $PYTHON_PATH /app/scripts/jellyfin_data_fetcher.py --url "$JELLYFIN_URL" --token "$JELLYFIN_TOKEN" --output /app/data/jellyfin $FETCH_ARGS ${JELLYFIN_LIBRARY_INTERVALS:+--library-intervals "$JELLYFIN_LIBRARY_INTERVALS"}
+    $MERGE_COMMAND
 fi
 
 # Fetch Emby data if configured (using jellyfin fetcher since APIs are compatible)
 if [ -n "$EMBY_URL" ] && [ -n "$EMBY_TOKEN" ]; then
     echo "Fetching Emby data using Jellyfin API compatibility"
-    $PYTHON_PATH /app/scripts/jellyfin_data_fetcher.py --url "$EMBY_URL" --token "$EMBY_TOKEN" --output /app/data/emby
+    $PYTHON_PATH /app/scripts/jellyfin_data_fetcher.py --url "$EMBY_URL" --token "$EMBY_TOKEN" --output /app/data/emby $FETCH_ARGS ${EMBY_LIBRARY_INTERVALS:+--library-intervals "$EMBY_LIBRARY_INTERVALS"}
+    $MERGE_COMMAND
 fi
 
 # Make sure the data directory is accessible by nginx
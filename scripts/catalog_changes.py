@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+import json
+import time
+import bisect
+import logging
+
+logger = logging.getLogger("glimpse.changes")
+
+# Change files live in <output>/changes/<generation>.json
+CHANGES_DIR = "changes"
+
+# Number of change files kept, so clients up to that many generations behind can catch up
+DEFAULT_CHANGE_GENERATIONS = 20
+
+def longest_ordered_subset(values):
+    """Return the indices of a longest strictly increasing subsequence of values"""
+    tails = []  # tails[k]: index of the smallest tail of an increasing run of length k + 1
+    tail_values = []
+    previous = [None] * len(values)
+    for index, value in enumerate(values):
+        length = bisect.bisect_left(tail_values, value)
+        previous[index] = tails[length - 1] if length else None
+        if length == len(tails):
+            tails.append(index)
+            tail_values.append(value)
+        else:
+            tails[length] = index
+            tail_values[length] = value
+
+    subset = set()
+    index = tails[-1] if tails else None
+    while index is not None:
+        subset.add(index)
+        index = previous[index]
+    return subset
+
+def diff_catalog(old_records, new_records):
+    """Return the change turning old_records into new_records, or None if records lack unique IDs.
+
+    Record order is preserved: added holds [position, record] pairs for their place
+    in the new catalog, changed holds records that kept their place, removed holds
+    IDs. Records that moved relative to the others (a renamed title sorting
+    elsewhere, say) are removed and added again.
+    """
+    old_by_id = {record.get('id'): (position, record) for position, record in enumerate(old_records)}
+    new_ids = [record.get('id') for record in new_records]
+    if (len(old_by_id) != len(old_records) or len(set(new_ids)) != len(new_ids) or
+            None in old_by_id or None in new_ids):
+        return None
+
+    # Records present in both versions, in new order, with their old positions
+    kept = [index for index, record_id in enumerate(new_ids) if record_id in old_by_id]
+    in_place = {kept[i] for i in longest_ordered_subset([old_by_id[new_ids[index]][0] for index in kept])}
+
+    added = []
+    changed = []
+    for index, record in enumerate(new_records):
+        if index not in in_place:
+            added.append([index, record])
+        elif record != old_by_id[record['id']][1]:
+            changed.append(record)
+
+    staying = {new_ids[index] for index in in_place}
+    removed = [record['id'] for record in old_records if record['id'] not in staying]
+
+    return {
+        'count': len(new_records),
+        'added': added,
+        'changed': changed,
+        'removed': removed
+    }
+
+class ChangeFeed:
+    """Per-generation diffs of the catalogs, published next to version.json.
+
+    Every publish that changes the catalog version starts a new generation and
+    writes changes/<generation>.json with the added, changed and removed records
+    of each catalog against the previous generation. version.json lists the
+    generation and the oldest change file still retained, so a client holding
+    an older generation can fetch and apply only the missing changes.
+    """
+
+    def __init__(self, publisher, retain=DEFAULT_CHANGE_GENERATIONS):
+        self.publisher = publisher
+        self.retain = retain
+        self.changes_dir = publisher.output_dir / CHANGES_DIR
+
+    def load_previous_catalogs(self, previous_manifest, names):
+        """Load the catalogs of the previous generation from their versioned files, or None"""
+        catalogs = {}
+        for name in names:
+            entry = previous_manifest.get('files', {}).get(name)
+            if not entry:
+                return None
+            try:
+                with open(self.publisher.output_dir / entry['path'], 'r') as f:
+                    catalogs[name] = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("Previous catalog %s not available, restarting the change feed: %s", entry['path'], e)
+                return None
+        return catalogs
+
+    def publish(self, previous_manifest, manifest, catalogs):
+        """Write the change file of a new generation and return the manifest fields of the feed"""
+        previous_generation = previous_manifest.get('generation', 0)
+        if previous_generation and previous_manifest.get('version') == manifest['version']:
+            return {'generation': previous_generation, 'changes': previous_manifest.get('changes')}
+
+        generation = previous_generation + 1
+        oldest = None
+        previous_catalogs = None
+        if previous_generation and self.retain > 0:
+            previous_catalogs = self.load_previous_catalogs(previous_manifest, catalogs)
+
+        if previous_catalogs is not None:
+            diffs = {name: diff_catalog(previous_catalogs[name], records) for name, records in catalogs.items()}
+            if all(diff is not None for diff in diffs.values()):
+                self.changes_dir.mkdir(exist_ok=True)
+                self.publisher.publish_json(f"{CHANGES_DIR}/{generation}.json", {
+                    'generation': generation,
+                    'previousVersion': previous_manifest.get('version'),
+                    'version': manifest['version'],
+                    'publishedAt': int(time.time()),
+                    'files': diffs
+                })
+                # The chain only reaches back as far as it is unbroken
+                previous_oldest = (previous_manifest.get('changes') or {}).get('oldest', generation)
+                oldest = max(previous_oldest, generation - self.retain + 1)
+                logger.info("Generation %d: %s", generation, ', '.join(
+                    f"{name} +{len(diff['added'])} ~{len(diff['changed'])} -{len(diff['removed'])}"
+                    for name, diff in diffs.items()))
+
+        self.prune(oldest)
+        return {'generation': generation, 'changes': {'oldest': oldest} if oldest else None}
+
+    def prune(self, oldest):
+        """Remove change files before the oldest retained generation, or all of them without a feed"""
+        if not self.changes_dir.is_dir():
+            return
+        for path in self.changes_dir.glob("*.json*"):
+            generation = path.name.split('.', 1)[0]
+            if not generation.isdigit() or oldest is None or int(generation) < oldest:
+                try:
+                    path.unlink()
+                except OSError as e:
+                    logger.warning("Could not remove old change file %s: %s", path, e)
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sys
+import shutil
+from pathlib import Path
+import argparse
+import logging
+import pwd
+import grp
+import fcntl
+from catalog_publisher import CatalogPublisher
+from sync_logging import setup_logging
+from search_index import SEARCH_INDEX_FILE, build_search_index
+from catalog_changes import DEFAULT_CHANGE_GENERATIONS
+from columnar_catalog import publish_columnar_catalogs
+from season_detail import refresh_season_details
+
+logger = logging.getLogger("glimpse.merger")
+
+# Provider IDs that identify the same title on every server
+MATCH_PROVIDERS = ('imdb', 'tmdb', 'tvdb')
+
+# Merges after each server's sync can start together; one holding this lock at a time writes the output
+MERGE_LOCK_FILE = ".merge.lock"
+
+# Servers in order of preference as artwork source when MERGE_SERVERS is not set
+DEFAULT_MERGE_SERVERS = ['plex', 'jellyfin', 'emby']
+
+# Catalog files and the media type their items belong to
+CATALOGS = {
+    'movie': 'movies.json',
+    'tvshow': 'tvshows.json'
+}
+
+class CatalogMerger:
+    def __init__(self, data_dir="data", servers=None, output_dir=None, change_generations=DEFAULT_CHANGE_GENERATIONS,
+                 columnar=False):
+        self.data_dir = Path(data_dir)
+        # Servers in order of preference - artwork is taken from the first one that has it
+        self.servers = list(servers or DEFAULT_MERGE_SERVERS)
+        self.output_dir = Path(output_dir) if output_dir else self.data_dir / "merged"
+        self.artwork_index_file = self.output_dir / "artwork_index.json"
+        self.change_generations = change_generations
+        self.columnar = columnar
+
+        # Get www-data UID and GID
+        try:
+            self.www_data_uid = pwd.getpwnam('www-data').pw_uid
+            self.www_data_gid = grp.getgrnam('www-data').gr_gid
+        except KeyError:
+            logger.warning("www-data user/group not found. File permissions will not be changed.")
+            self.www_data_uid = self.www_data_gid = None
+
+        self.setup_directories()
+
+    def set_permissions(self, path):
+        """Set permissions to www-data:www-data"""
+        if self.www_data_uid is not None and self.www_data_gid is not None:
+            try:
+                os.chown(path, self.www_data_uid, self.www_data_gid)
+            except PermissionError:
+                logger.warning("Insufficient permissions to change ownership of %s. Run as root/sudo.", path)
+            except Exception as e:
+                logger.error("Error setting permissions for %s: %s", path, e)
+
+    def setup_directories(self):
+        """Create necessary directory structure"""
+        directories = [
+            self.output_dir,
+            self.output_dir / "posters" / "movies",
+            self.output_dir / "posters" / "tvshows",
+            self.output_dir / "backdrops" / "movies",
+            self.output_dir / "backdrops" / "tvshows"
+        ]
+        for directory in directories:
+            directory.mkdir(parents=True, exist_ok=True)
+            self.set_permissions(directory)
+
+    def load_catalog(self, server, file_name):
+        """Load one server's catalog file, returning an empty list if it is missing"""
+        path = self.data_dir / server / file_name
+        if not path.exists():
+            return []
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error("Error loading %s: %s", path, e)
+            return []
+
+    @staticmethod
+    def match_keys(item, media_type):
+        """Return the index keys identifying an item across servers"""
+        provider_ids = item.get('providerIds') or {}
+        return [
+            f"{media_type}:{provider}:{provider_ids[provider]}"
+            for provider in MATCH_PROVIDERS if provider_ids.get(provider)
+        ]
+
+    def merge_media_type(self, media_type, file_name):
+        """Group one media type's items from all servers into logical titles.
+
+        Every provider key points at the title it was first seen on in a single
+        dict, so matching is one lookup per key and the whole merge stays O(n).
+        """
+        index = {}
+        titles = []
+
+        for server in self.servers:
+            for item in self.load_catalog(server, file_name):
+                keys = self.match_keys(item, media_type)
+                title = next((index[key] for key in keys if key in index), None)
+
+                if title is None:
+                    title = {'record': dict(item), 'sources': []}
+                    title['record']['id'] = f"{server}-{item.get('id', '')}"
+                    titles.append(title)
+                else:
+                    # Fill fields the preferred source left empty
+                    for field, value in item.items():
+                        if value and not title['record'].get(field):
+                            title['record'][field] = value
+                    title['record']['providerIds'] = {
+                        **(item.get('providerIds') or {}),
+                        **(title['record'].get('providerIds') or {})
+                    }
+
+                title['sources'].append({'server': server, 'id': str(item.get('id', ''))})
+                for key in keys:
+                    index.setdefault(key, title)
+
+        return titles
+
+    def artwork_source(self, title, kind, media_type):
+        """Return the first existing artwork file for a title in server preference order"""
+        for source in title['sources']:
+            path = self.data_dir / source['server'] / kind / f"{media_type}s" / f"{source['id']}.jpg"
+            if path.exists():
+                return path
+        return None
+
+    def link_artwork(self, source_path, output_path):
+        """Hard link artwork into the merged catalog, falling back to a copy"""
+        if output_path.exists():
+            if os.path.samefile(source_path, output_path):
+                return
+            output_path.unlink(missing_ok=True)
+        try:
+            os.link(source_path, output_path)
+        except OSError:
+            shutil.copyfile(source_path, output_path)
+        self.set_permissions(output_path)
+
+    def merge(self):
+        """Main method to merge all server catalogs and publish the result, after any merge already running"""
+        with open(self.output_dir / MERGE_LOCK_FILE, 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logger.info("Waiting for another catalog merge to finish")
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            self.merge_catalogs()
+
+    def merge_catalogs(self):
+        """Merge all server catalogs and publish the result (merge lock held by caller)"""
+        logger.info("Starting catalog merge, servers in order of preference: %s", ', '.join(self.servers))
+
+        publisher = CatalogPublisher(self.output_dir, self.set_permissions, self.change_generations)
+        artwork_index = {}
+        results = []
+        catalogs = {}
+
+        for media_type, file_name in CATALOGS.items():
+            titles = self.merge_media_type(media_type, file_name)
+            expected = set()
+            records = []
+
+            for title in titles:
+                record = title['record']
+                record['sources'] = title['sources']
+
+                artwork = {}
+                for kind in ('posters', 'backdrops'):
+                    source_path = self.artwork_source(title, kind, media_type)
+                    if source_path is None:
+                        continue
+                    output_path = self.output_dir / kind / f"{media_type}s" / f"{record['id']}.jpg"
+                    self.link_artwork(source_path, output_path)
+                    expected.add(output_path)
+                    artwork[kind[:-1]] = str(source_path.resolve())
+
+                if artwork:
+                    for key in self.match_keys(record, media_type):
+                        artwork_index[key] = artwork
+                records.append(record)
+
+            # Drop artwork of titles that no longer exist on any server
+            for kind in ('posters', 'backdrops'):
+                for path in (self.output_dir / kind / f"{media_type}s").glob("*.jpg"):
+                    if path not in expected:
+                        path.unlink(missing_ok=True)
+
+            duplicates = sum(len(title['sources']) - 1 for title in titles)
+            logger.info("%s: %d titles (%d duplicates merged)", file_name, len(records), duplicates)
+            results.append(publisher.publish_json(file_name, records, versioned=True))
+            catalogs[media_type] = records
+
+        # Search index over the merged titles, cast and studios
+        search_index = build_search_index(catalogs['movie'], catalogs['tvshow'])
+        results.append(publisher.publish_json(SEARCH_INDEX_FILE, search_index, versioned=True))
+
+        # Columnar copies of the merged catalogs for very large libraries
+        records_by_file = {file_name: catalogs[media_type] for media_type, file_name in CATALOGS.items()}
+        results.extend(publish_columnar_catalogs(publisher, records_by_file, self.columnar))
+
+        manifest = publisher.publish_manifest(results, records_by_file)
+        logger.info("Published data version: %s", manifest['version'])
+
+        # Season detail of merged shows is generated on request; drop files the merged records outgrew
+        stats = refresh_season_details(self.output_dir, catalogs['tvshow'])
+        if stats.get('removed'):
+            logger.info("Season detail of merged shows: %d outdated files removed", stats['removed'])
+
+        # Artwork index the fetchers use to reuse artwork instead of downloading it again
+        publisher.publish_json(self.artwork_index_file.name, artwork_index)
+        logger.info("Artwork index: %d provider IDs -> %s", len(artwork_index), self.artwork_index_file)
+
+        logger.info("Catalog merge completed, data saved to: %s", self.output_dir)
+
+def main():
+    # Get values from environment variables first
+    default_data_dir = os.environ.get('DATA_DIR', 'data')
+    default_output = os.environ.get('MERGED_OUTPUT_DIR', '')
+    servers_str = os.environ.get('MERGE_SERVERS', ','.join(DEFAULT_MERGE_SERVERS))
+    default_servers = [server.strip() for server in servers_str.split(',') if server.strip()]
+
+    parser = argparse.ArgumentParser(description='Merge Plex, Jellyfin and Emby catalogs into one deduplicated catalog')
+
+    parser.add_argument('--data-dir', default=default_data_dir, help='Directory holding the per-server data (default: data)')
+    parser.add_argument('--servers', nargs='*', default=default_servers,
+                        help='Servers to merge, preferred artwork source first (default: plex jellyfin emby)')
+    parser.add_argument('--output', default=default_output, help='Output directory (default: <data-dir>/merged)')
+    parser.add_argument('--log-level', default=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='Logging level (default: INFO)')
+    parser.add_argument('--change-generations', type=int,
+                        default=int(os.environ.get('CHANGE_GENERATIONS', str(DEFAULT_CHANGE_GENERATIONS))),
+                        help=f'Catalog generations to keep change files for, 0 disables them (default: {DEFAULT_CHANGE_GENERATIONS})')
+    parser.add_argument('--columnar', action='store_true',
+                        default=os.environ.get('COLUMNAR_CATALOG', 'false').lower() == 'true',
+                        help='Also publish columnar copies of the merged catalogs (movies.columns.json)')
+
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+
+    if not args.servers:
+        logger.error("At least one server is required. Set with --servers or MERGE_SERVERS environment variable.")
+        sys.exit(1)
+
+    merger = CatalogMerger(args.data_dir, args.servers, args.output or None, args.change_generations,
+                           args.columnar)
+    merger.merge()
+
+if __name__ == "__main__":
+    main()
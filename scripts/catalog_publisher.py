@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import re
+import gzip
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+from catalog_changes import DEFAULT_CHANGE_GENERATIONS, ChangeFeed
+
+# Brotli is optional - when the module is missing only .gz sidecars are written
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger("glimpse.publisher")
+
+# Length of the content hash embedded in versioned catalog file names
+VERSION_HASH_LENGTH = 12
+
+# Image references written by the fetchers in lazy mode for the image proxy, relative image path -> upstream path
+IMAGE_REFS_FILE = "image_refs.json"
+
+# Image kinds the fetchers leave to the image proxy for each --lazy-images mode
+LAZY_IMAGE_MODES = {
+    'off': (),
+    'backdrops': ('backdrop',),
+    'all': ('poster', 'backdrop')
+}
+
+class CatalogPublisher:
+    """Write catalog JSON files as compact JSON plus precompressed sidecars.
+
+    Files are only rewritten when their content changes, so the mtime/size based
+    ETags nginx derives for them stay stable between syncs and clients can
+    revalidate with a cheap 304 instead of downloading the catalog again.
+
+    Catalogs can also be published under a content-versioned name
+    (movies.<hash>.json) and listed in a small version.json manifest, so the
+    service worker can keep them in Cache Storage until their hash changes.
+    Each new version is also a numbered generation with a change file against
+    the previous one (see ChangeFeed), so clients can catch up incrementally.
+    """
+
+    def __init__(self, output_dir, set_permissions=None, change_generations=DEFAULT_CHANGE_GENERATIONS):
+        self.output_dir = Path(output_dir)
+        self.set_permissions = set_permissions or (lambda path: None)
+        self.change_feed = ChangeFeed(self, change_generations)
+
+    @staticmethod
+    def encode_json(data):
+        """Serialize data as compact UTF-8 JSON"""
+        return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+    @staticmethod
+    def file_sha256(path):
+        """Return the SHA-256 hex digest of a file, or None if it does not exist"""
+        try:
+            with open(path, 'rb') as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def versioned_name(name, digest):
+        """Return the content-versioned file name for a catalog file"""
+        stem, suffix = os.path.splitext(name)
+        return f"{stem}.{digest[:VERSION_HASH_LENGTH]}{suffix}"
+
+    def write_atomic(self, path, payload, mtime=None):
+        """Write payload to path via a temporary file and an atomic rename"""
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.chmod(tmp_path, 0o644)
+            if mtime is not None:
+                os.utime(tmp_path, (mtime, mtime))
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self.set_permissions(path)
+
+    def write_sidecars(self, path, payload, mtime):
+        """Write .gz (and .br when available) versions of payload next to path"""
+        gz_path = path.with_name(path.name + '.gz')
+        self.write_atomic(gz_path, gzip.compress(payload, compresslevel=9, mtime=0), mtime)
+
+        br_path = path.with_name(path.name + '.br')
+        if brotli is not None:
+            self.write_atomic(br_path, brotli.compress(payload, quality=11), mtime)
+        elif br_path.exists():
+            # Never leave a stale .br behind that nginx would prefer over fresh data
+            br_path.unlink()
+
+    def publish_json(self, name, data, versioned=False):
+        """Publish data as output_dir/name and return a summary of the written file"""
+        payload = self.encode_json(data)
+        digest = hashlib.sha256(payload).hexdigest()
+
+        result = self.publish_payload(name, payload, digest)
+        if versioned:
+            result['versioned_name'] = self.versioned_name(name, digest)
+            self.publish_payload(result['versioned_name'], payload, digest)
+        return result
+
+    def publish_payload(self, name, payload, digest):
+        """Write an encoded payload and its sidecars unless the content is unchanged"""
+        path = self.output_dir / name
+        changed = self.file_sha256(path) != digest
+        gz_missing = not path.with_name(path.name + '.gz').exists()
+        br_missing = brotli is not None and not path.with_name(path.name + '.br').exists()
+
+        if changed:
+            self.write_atomic(path, payload)
+        if changed or gz_missing or br_missing:
+            # Sidecars share the mtime of the JSON so gzip_static never serves stale data
+            self.write_sidecars(path, payload, path.stat().st_mtime)
+
+        return {
+            'path': path,
+            'sha256': digest,
+            'size': len(payload),
+            'changed': changed
+        }
+
+    def load_manifest(self):
+        """Load the previously published version.json, if any"""
+        try:
+            with open(self.output_dir / "version.json", 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def publish_manifest(self, results, catalogs=None):
+        """Publish version.json for versioned catalog results and prune stale versions.
+
+        Versions referenced by the previous manifest are kept, so clients that
+        read it just before this publish can still fetch the files it lists.
+        catalogs maps catalog file names to their records for the change feed.
+        """
+        previous = self.load_manifest()
+
+        files = {}
+        for result in results:
+            files[result['path'].name] = {
+                'path': result['versioned_name'],
+                'sha256': result['sha256'],
+                'size': result['size']
+            }
+
+        combined = hashlib.sha256(
+            ''.join(files[name]['sha256'] for name in sorted(files)).encode('ascii')
+        ).hexdigest()
+        manifest = {
+            'version': combined[:VERSION_HASH_LENGTH],
+            'files': files
+        }
+        if catalogs is not None:
+            manifest.update(self.change_feed.publish(previous, manifest, catalogs))
+        self.publish_json("version.json", manifest)
+
+        keep = {entry['path'] for entry in files.values()}
+        keep.update(entry.get('path') for entry in previous.get('files', {}).values())
+        self.prune_versions(files.keys(), keep)
+
+        return manifest
+
+    def prune_versions(self, names, keep):
+        """Remove versioned copies of the given catalog files that are not in keep"""
+        for name in names:
+            stem, suffix = os.path.splitext(name)
+            pattern = re.compile(
+                rf"^{re.escape(stem)}\.[0-9a-f]{{{VERSION_HASH_LENGTH}}}{re.escape(suffix)}$"
+            )
+            for path in self.output_dir.glob(f"{stem}.*"):
+                base_name = re.sub(r"\.(gz|br)$", "", path.name)
+                if pattern.match(base_name) and base_name not in keep:
+                    try:
+                        path.unlink()
+                    except OSError as e:
+                        logger.warning("Could not remove old catalog version %s: %s", path, e)
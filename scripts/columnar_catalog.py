@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import argparse
+import logging
+from collections import Counter
+from pathlib import Path
+from catalog_publisher import CatalogPublisher
+from sync_logging import setup_logging
+from search_index import delta_encode
+
+logger = logging.getLogger("glimpse.columnar")
+
+# Bumped whenever the layout changes, so the UI can ignore files it does not understand
+COLUMNAR_VERSION = 1
+
+# Fields whose values repeat across the catalog, stored once in a string table per field
+STRING_FIELDS = ('studio', 'contentRating')
+STRING_LIST_FIELDS = ('genres',)
+
+# Unix timestamps, stored as integers relative to the smallest one of the column
+TIMESTAMP_FIELDS = ('addedAt', 'updatedAt')
+
+def columnar_name(name):
+    """Return the file name of a catalog's columnar copy (movies.json -> movies.columns.json)"""
+    stem, suffix = os.path.splitext(name)
+    return f"{stem}.columns{suffix}"
+
+def is_timestamp(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def is_string_list(value):
+    return isinstance(value, list) and all(isinstance(entry, str) for entry in value)
+
+def string_table(values):
+    """Return the distinct strings of values, most frequent first so they get the shortest indexes"""
+    counts = Counter(values)
+    return sorted(counts, key=lambda value: (-counts[value], value))
+
+def encode_column(field, records):
+    """Encode one field of all records.
+
+    absent lists (delta encoded) the records without the field, raw holds
+    [position, value] pairs for values the column's encoding cannot represent.
+    Both keep a null in values.
+    """
+    present = [(position, record[field]) for position, record in enumerate(records) if field in record]
+    column = {'field': field, 'encoding': 'plain'}
+
+    if field in STRING_FIELDS:
+        column['encoding'] = 'strings'
+        fits = lambda value: isinstance(value, str)
+        column['strings'] = string_table(value for _, value in present if fits(value))
+        index = {value: i for i, value in enumerate(column['strings'])}
+        encode = lambda value: index[value]
+    elif field in STRING_LIST_FIELDS:
+        column['encoding'] = 'string-lists'
+        fits = is_string_list
+        column['strings'] = string_table(entry for _, value in present if fits(value) for entry in value)
+        index = {value: i for i, value in enumerate(column['strings'])}
+        encode = lambda value: [index[entry] for entry in value]
+    elif field in TIMESTAMP_FIELDS:
+        column['encoding'] = 'timestamps'
+        fits = is_timestamp
+        column['base'] = min((value for _, value in present if fits(value)), default=0)
+        encode = lambda value: value - column['base']
+    else:
+        fits = lambda value: True
+        encode = lambda value: value
+
+    values = [None] * len(records)
+    raw = []
+    for position, value in present:
+        if fits(value):
+            values[position] = encode(value)
+        else:
+            raw.append([position, value])
+
+    absent = [position for position, record in enumerate(records) if field not in record]
+    if absent:
+        column['absent'] = delta_encode(absent)
+    if raw:
+        column['raw'] = raw
+    column['values'] = values
+    return column
+
+def encode_catalog(records):
+    """Encode a catalog as one array per field instead of one object per record.
+
+    Fields keep the order in which they first appear. Decoding gives records
+    equal to the originals, although the keys of a record may come in a
+    different order.
+    """
+    fields = list(dict.fromkeys(field for record in records for field in record))
+    return {
+        'version': COLUMNAR_VERSION,
+        'count': len(records),
+        'columns': [encode_column(field, records) for field in fields]
+    }
+
+def decode_catalog(document):
+    """Turn a columnar catalog back into records - the reference for the decoder in the UI"""
+    records = [{} for _ in range(document['count'])]
+    for column in document['columns']:
+        absent = set()
+        position = 0
+        for delta in column.get('absent', []):
+            position += delta
+            absent.add(position)
+        raw = {position: value for position, value in column.get('raw', [])}
+
+        encoding = column['encoding']
+        for position, value in enumerate(column['values']):
+            if position in absent:
+                continue
+            if position in raw:
+                value = raw[position]
+            elif encoding == 'strings':
+                value = column['strings'][value]
+            elif encoding == 'string-lists':
+                value = [column['strings'][entry] for entry in value]
+            elif encoding == 'timestamps':
+                value = column['base'] + value
+            records[position][column['field']] = value
+    return records
+
+def remove_columnar(output_dir, name):
+    """Remove the columnar copy of a catalog with its versions and sidecars"""
+    stem = os.path.splitext(columnar_name(name))[0]
+    for path in Path(output_dir).glob(f"{stem}.*"):
+        try:
+            path.unlink()
+        except OSError as e:
+            logger.warning("Could not remove columnar catalog %s: %s", path, e)
+
+def publish_columnar_catalogs(publisher, catalogs, enabled=True):
+    """Publish versioned columnar copies of catalogs (file name -> records), returning the results.
+
+    When disabled, copies of earlier runs are removed so the manifest never
+    points the UI at stale data.
+    """
+    results = []
+    for name, records in catalogs.items():
+        if not enabled:
+            remove_columnar(publisher.output_dir, name)
+            continue
+        results.append(publisher.publish_json(columnar_name(name), encode_catalog(records), versioned=True))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that published catalogs survive the columnar encoding and compare sizes')
+    parser.add_argument('catalogs', nargs='+', help='Catalog files, e.g. data/plex/movies.json')
+    parser.add_argument('--log-level', default=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='Logging level (default: INFO)')
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+
+    failed = False
+    for path in args.catalogs:
+        with open(path, 'r') as f:
+            records = json.load(f)
+        document = encode_catalog(records)
+        # Compare after a JSON round trip, the way the UI receives the file
+        decoded = decode_catalog(json.loads(CatalogPublisher.encode_json(document)))
+        if decoded != records:
+            mismatches = sum(1 for old, new in zip(records, decoded) if old != new)
+            logger.error("%s: columnar copy differs in %d of %d records", path, mismatches, len(records))
+            failed = True
+            continue
+        logger.info("%s: %d records round-trip, %d bytes as records, %d bytes as columns", path, len(records),
+                    len(CatalogPublisher.encode_json(records)), len(CatalogPublisher.encode_json(document)))
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import json
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import requests
+from sync_logging import setup_logging
+from catalog_publisher import IMAGE_REFS_FILE
+from season_detail import SEASON_FETCHERS, USER_ID_FETCHERS, seasons_name, generate_seasons, www_data_permissions
+
+logger = logging.getLogger("glimpse.image_proxy")
+
+# Media servers the proxy can fetch from: environment variables for URL and token, and the token header
+UPSTREAMS = {
+    'plex': ('PLEX_URL', 'PLEX_TOKEN', 'X-Plex-Token'),
+    'jellyfin': ('JELLYFIN_URL', 'JELLYFIN_TOKEN', 'X-Emby-Token'),
+    'emby': ('EMBY_URL', 'EMBY_TOKEN', 'X-Emby-Token')
+}
+
+# /data/<server>/<posters|backdrops>/<movies|tvshows>/<id>.jpg, the paths the UI requests
+IMAGE_PATH_PATTERN = re.compile(r'^/data/([a-z]+)/(posters|backdrops)/(movies|tvshows)/([A-Za-z0-9_-]+)\.jpg$')
+
+# /data/<server>/tvshows/<id>/seasons.json, season detail the sync has not written yet
+SEASONS_PATH_PATTERN = re.compile(r'^/data/([a-z]+)/tvshows/([A-Za-z0-9_-]+)/seasons\.json$')
+
+UPSTREAM_TIMEOUT = 30
+
+class ImageCache:
+    """Disk cache of upstream images with a byte budget and least-recently-used eviction.
+
+    The recency order lives in memory; hits also bump the file mtime so the order
+    survives a restart, when it is rebuilt from a directory scan.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> size, least recently used first
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        files = []
+        for path in self.cache_dir.glob("*/*.img"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(files):
+            self.entries[key] = size
+            self.total_bytes += size
+        self.evict()
+        logger.info("Image cache: %d files, %d of %d bytes used", len(self.entries), self.total_bytes, self.max_bytes)
+
+    def path_for(self, key):
+        return self.cache_dir / key[:2] / f"{key}.img"
+
+    def get(self, key):
+        """Return the cached image of a key and mark it as recently used, or None on a miss"""
+        with self.lock:
+            if key not in self.entries:
+                return None
+            # Opened under the lock, so a concurrent eviction cannot remove the file before it is read
+            try:
+                f = open(self.path_for(key), 'rb')
+            except FileNotFoundError:
+                # Removed behind our back - forget it and treat as a miss
+                self.total_bytes -= self.entries.pop(key)
+                return None
+            self.entries.move_to_end(key)
+        with f:
+            os.utime(f.fileno())
+            return f.read()
+
+    def put(self, key, data):
+        """Store an image, evict the least recently used ones beyond the byte budget and return the image"""
+        path = self.path_for(key)
+        path.parent.mkdir(exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+        with self.lock:
+            self.total_bytes += len(data) - self.entries.pop(key, 0)
+            self.entries[key] = len(data)
+            self.evict()
+        return data
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits its budget (lock held by caller)"""
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            key, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                self.path_for(key).unlink()
+            except FileNotFoundError:
+                pass
+
+class RequestCoalescer:
+    """Run one call per key at a time; concurrent callers for the same key share its result"""
+
+    class Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.inflight = {}
+
+    def run(self, key, function):
+        with self.lock:
+            call = self.inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self.inflight[key] = self.Call()
+
+        if leader:
+            try:
+                call.result = function()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self.lock:
+                    del self.inflight[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+class UpstreamNotFound(Exception):
+    """The media server (or the image references or catalog) do not know the requested image or show"""
+
+class ImageProxy:
+    """Resolve UI image paths to media server images, serving them through an ImageCache.
+
+    Requests for season detail of shows nobody opened yet end up here as well and
+    are handed to season_detail.generate_seasons.
+    """
+
+    def __init__(self, data_dir, cache, upstreams, set_permissions=None):
+        self.data_dir = Path(data_dir)
+        self.cache = cache
+        self.upstreams = upstreams
+        self.set_permissions = set_permissions
+        self.season_fetchers = {
+            server: lambda show_id, server=server: SEASON_FETCHERS[server](
+                self.session(server), self.upstreams[server][0], show_id, UPSTREAM_TIMEOUT, self.user_id(server))
+            for server in upstreams
+        }
+        self.user_ids = {}  # server -> user ID for season requests, resolved on first use
+        self.coalescer = RequestCoalescer()
+        self.data_files = {}  # (server, file name) -> (mtime, data)
+        self.data_files_lock = threading.Lock()
+        self.local = threading.local()
+
+    def load_data_file(self, server, name, transform=None):
+        """Return a JSON file the fetcher of a server published, reloading it when the fetcher rewrote it"""
+        path = self.data_dir / server / name
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return {}
+        with self.data_files_lock:
+            cached = self.data_files.get((server, name))
+            if cached and cached[0] == mtime:
+                return cached[1]
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error("Error loading %s: %s", path, e)
+            return {}
+        if transform:
+            data = transform(data)
+        with self.data_files_lock:
+            self.data_files[(server, name)] = (mtime, data)
+        return data
+
+    def load_refs(self, server):
+        """Return the image references of a server"""
+        return self.load_data_file(server, IMAGE_REFS_FILE)
+
+    def load_shows(self, server):
+        """Return the TV show records of a server's catalog by ID"""
+        return self.load_data_file(server, "tvshows.json", lambda shows: {show['id']: show for show in shows})
+
+    def upstream_for(self, server, item_id):
+        """Return (upstream server, item ID) for a server and item ID as the UI knows them"""
+        if server == 'merged':
+            # Merged titles are named <server>-<id> after the server their record came from
+            server, _, item_id = item_id.partition('-')
+        if server not in self.upstreams:
+            raise UpstreamNotFound(f"no upstream configured for {server}")
+        return server, item_id
+
+    def resolve(self, server, kind, media, item_id):
+        """Return (upstream server, upstream path) for a UI image path"""
+        server, item_id = self.upstream_for(server, item_id)
+        ref = self.load_refs(server).get(f"{kind}/{media}/{item_id}.jpg")
+        if not ref:
+            raise UpstreamNotFound(f"no image reference for {server}/{kind}/{media}/{item_id}")
+        return server, ref
+
+    def session(self, server):
+        """Per-thread requests session for an upstream server"""
+        sessions = self.local.__dict__.setdefault('sessions', {})
+        if server not in sessions:
+            _, token, header = self.upstreams[server]
+            sessions[server] = requests.Session()
+            sessions[server].headers.update({header: token})
+        return sessions[server]
+
+    def user_id(self, server):
+        """Return the user season requests to a server are made for, resolved like the fetchers do"""
+        if server not in USER_ID_FETCHERS:
+            return None
+        if server not in self.user_ids:
+            user_id = USER_ID_FETCHERS[server](self.session(server), self.upstreams[server][0], UPSTREAM_TIMEOUT)
+            if not user_id:
+                raise UpstreamNotFound(f"{server} has no users")
+            self.user_ids[server] = user_id
+        return self.user_ids[server]
+
+    def fetch_upstream(self, server, ref, key):
+        """Download an image from the media server into the cache"""
+        base_url = self.upstreams[server][0]
+        response = self.session(server).get(f"{base_url}{ref}", timeout=UPSTREAM_TIMEOUT)
+        if response.status_code == 404:
+            raise UpstreamNotFound(f"{server} has no image at {ref}")
+        response.raise_for_status()
+        return self.cache.put(key, response.content)
+
+    def get_image(self, server, kind, media, item_id):
+        """Return (image bytes, cache hit) for a UI image path"""
+        server, ref = self.resolve(server, kind, media, item_id)
+        key = hashlib.sha256(f"{server}|{ref}".encode('utf-8')).hexdigest()
+
+        data = self.cache.get(key)
+        if data is not None:
+            return data, True
+
+        # Concurrent misses for the same image wait for a single upstream fetch
+        data = self.coalescer.run(key, lambda: self.cache.get(key) or self.fetch_upstream(server, ref, key))
+        return data, False
+
+    def get_seasons(self, server, show_id):
+        """Return (seasons.json path, already written) for a show, generating the file on first request"""
+        path = self.data_dir / server / seasons_name(show_id)
+        if path.exists():
+            return path, True
+
+        # Only shows of the published catalog, so arbitrary IDs never reach the media server
+        show = self.load_shows(server).get(show_id)
+        if not show:
+            raise UpstreamNotFound(f"{server} catalog has no show {show_id}")
+
+        def generate():
+            if not path.exists():
+                if generate_seasons(self.data_dir, server, show, self.season_fetchers, self.set_permissions) is None:
+                    raise UpstreamNotFound(f"no upstream configured for {server}/{show_id}")
+                logger.info("Generated season detail of %s/%s", server, show_id)
+            return path
+
+        return self.coalescer.run(f"seasons|{server}|{show_id}", generate), False
+
+class ImageProxyHandler(BaseHTTPRequestHandler):
+    server_version = "GlimpseImageProxy/1.0"
+    # Keep-alive between nginx and the proxy; replies are small, so avoid Nagle delays
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.serve(send_body=True)
+
+    def do_HEAD(self):
+        self.serve(send_body=False)
+
+    def serve(self, send_body):
+        request_path = self.path.split('?', 1)[0]
+        image_match = IMAGE_PATH_PATTERN.match(request_path)
+        seasons_match = SEASONS_PATH_PATTERN.match(request_path)
+        if not image_match and not seasons_match:
+            return self.send_status(404)
+
+        try:
+            if image_match:
+                data, hit = self.server.proxy.get_image(*image_match.groups())
+            else:
+                path, hit = self.server.proxy.get_seasons(*seasons_match.groups())
+                data = path.read_bytes()
+        except UpstreamNotFound as e:
+            logger.debug("Not found: %s", e)
+            return self.send_status(404)
+        except (requests.RequestException, OSError, ValueError) as e:
+            logger.warning("Error serving %s: %s", self.path, e)
+            return self.send_status(502)
+
+        self.send_response(200)
+        if image_match:
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Cache-Control", "public, max-age=604800")
+        else:
+            # Refreshed by the sync when the show changes, like the other unversioned catalog JSON
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Cache-Control", "no-cache")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("X-Cache", "HIT" if hit else "MISS")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(data)
+
+    def send_status(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+def configured_upstreams(environ=os.environ):
+    """Return the media servers with both URL and token configured"""
+    upstreams = {}
+    for server, (url_var, token_var, header) in UPSTREAMS.items():
+        if environ.get(url_var) and environ.get(token_var):
+            upstreams[server] = (environ[url_var].rstrip('/'), environ[token_var], header)
+    return upstreams
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve media server images on demand through a size-capped LRU disk cache, '
+                                                 'and season detail of shows on first request')
+
+    parser.add_argument('--data-dir', default=os.environ.get('DATA_DIR', 'data'),
+                        help='Directory holding the per-server data and image references (default: data)')
+    parser.add_argument('--cache-dir', default=os.environ.get('IMAGE_CACHE_DIR', 'cache/images'),
+                        help='Directory of the image cache (default: cache/images)')
+    parser.add_argument('--cache-size-mb', type=int, default=int(os.environ.get('IMAGE_CACHE_MB', '1024')),
+                        help='Byte budget of the image cache in MiB (default: 1024)')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('IMAGE_PROXY_PORT', '8090')),
+                        help='Port to listen on (default: 8090)')
+    parser.add_argument('--log-level', default=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='Logging level (default: INFO)')
+
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+
+    upstreams = configured_upstreams()
+    if not upstreams:
+        logger.warning("No media server credentials configured - every image request will be a 404")
+
+    cache = ImageCache(args.cache_dir, args.cache_size_mb * 1024 * 1024)
+    server = ThreadingHTTPServer((args.host, args.port), ImageProxyHandler)
+    server.daemon_threads = True
+    server.proxy = ImageProxy(args.data_dir, cache, upstreams, www_data_permissions())
+
+    logger.info("Image proxy listening on %s:%d for %s", args.host, args.port, ', '.join(upstreams) or "no servers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
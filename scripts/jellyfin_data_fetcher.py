@@ -7,28 +7,89 @@ import sys
 from pathlib import Path
 import argparse
 from datetime import datetime
-import time
 import pwd
 import grp
 import hashlib
+import base64
 import pickle
+import logging
+from collections import Counter
+from catalog_publisher import CatalogPublisher, IMAGE_REFS_FILE, LAZY_IMAGE_MODES
+from catalog_changes import DEFAULT_CHANGE_GENERATIONS
+from columnar_catalog import publish_columnar_catalogs
+from sync_logging import setup_logging, format_duration, ProgressReporter
+from sync_profiler import SyncProfiler
+from sync_priority import DEFAULT_PRIORITY_ITEMS, split_catalog, carry_over_enrichment
+from search_index import SEARCH_INDEX_FILE, build_search_index
+from shared_artwork import SharedArtwork
+from catalog_merger import DEFAULT_MERGE_SERVERS
+from season_detail import fetch_jellyfin_seasons, refresh_season_details
+from sync_recovery import (LIBRARY_STATE_FILE, DEFAULT_RETRY_DELAYS, ALL_LIBRARIES, IncompleteLibraryError,
+                           LibraryState, check_listing, parse_retry_delays)
+from sync_schedule import LibrarySchedule, parse_library_intervals
+
+logger = logging.getLogger("glimpse.jellyfin")
+
+# Fields only the per-series requests fill, refreshed last in a prioritized sync
+ENRICHED_FIELDS = ('leafCount', 'childCount')
+
+# Item types requested for each media type (None lists movies and series together)
+LIST_ITEM_TYPES = {
+    'movie': "Movie",
+    'tvshow': "Series",
+    None: "Movie,Series"
+}
+
+# Library types that cannot hold movies or series outside of movie and TV libraries
+COMBINED_LIBRARY_TYPES = {
+    'movies', 'tvshows', 'music', 'musicvideos', 'books', 'photos',
+    'homevideos', 'playlists', 'livetv', 'boxsets'
+}
 
 class JellyfinDataFetcher:
-    def __init__(self, jellyfin_url, jellyfin_token, output_dir="data/jellyfin", page_size=100, excluded_libraries=None):
+    def __init__(self, jellyfin_url, jellyfin_token, output_dir="data/jellyfin", page_size=100, excluded_libraries=None, preview_width=20,
+                 shared_artwork_index=None, profile=False, prioritized=False, priority_items=DEFAULT_PRIORITY_ITEMS,
+                 lazy_images='off', retry_delays=None, change_generations=DEFAULT_CHANGE_GENERATIONS,
+                 columnar=False, library_intervals=None, shared_artwork_servers=None):
         self.jellyfin_url = jellyfin_url.rstrip('/')
         self.jellyfin_token = jellyfin_token
         self.output_dir = Path(output_dir)
         self.page_size = page_size
         self.excluded_libraries = set(excluded_libraries or [])
+        self.preview_width = preview_width  # Width of inline poster previews, 0 disables them
         self.checksums_file = self.output_dir / "checksums.pkl"
         self.checksums = self.load_checksums()
+        # Image outcomes of the library being processed, summarized once per library
+        self.image_stats = Counter()
+        # Artwork other servers already downloaded for the same titles (enabled with the merge's artwork index)
+        self.shared_artwork = None
+        if shared_artwork_index:
+            self.shared_artwork = SharedArtwork(self.output_dir, shared_artwork_servers or DEFAULT_MERGE_SERVERS,
+                                                shared_artwork_index, self.set_permissions)
+        # Image kinds left to the on-demand image proxy, which fetches them from image_refs.json
+        self.lazy_kinds = LAZY_IMAGE_MODES[lazy_images]
+        self.image_refs = {}
+        # Publish the catalog in milestones, newest posters first (see fetch_and_save_data_prioritized)
+        self.prioritized = prioritized
+        self.priority_items = priority_items
+        # Libraries that fail keep their last complete data and are retried after these delays (seconds)
+        self.retry_delays = parse_retry_delays(DEFAULT_RETRY_DELAYS) if retry_delays is None else retry_delays
+        # Libraries with a refresh interval are only synced once it has passed, others on every run
+        self.library_schedule = LibrarySchedule(library_intervals)
+        self.library_state = LibraryState(self.output_dir, self.image_refs, self.library_schedule)
+        # Number of catalog generations whose change files stay available to clients
+        self.change_generations = change_generations
+        # Also publish the catalogs column by column, which the UI prefers when listed in version.json
+        self.columnar = columnar
+        # Per-phase cProfile/tracemalloc recording, only active with --profile
+        self.profiler = SyncProfiler(self.output_dir, enabled=profile, set_permissions=self.set_permissions)
         
         # Get www-data UID and GID
         try:
             self.www_data_uid = pwd.getpwnam('www-data').pw_uid
             self.www_data_gid = grp.getgrnam('www-data').gr_gid
         except KeyError:
-            print("Warning: www-data user/group not found. File permissions will not be changed.")
+            logger.warning("www-data user/group not found. File permissions will not be changed.")
             self.www_data_uid = self.www_data_gid = None
         
         # Setup directories after initializing UID/GID
@@ -47,7 +108,7 @@ class JellyfinDataFetcher:
                 with open(self.checksums_file, 'rb') as f:
                     return pickle.load(f)
             except Exception as e:
-                print(f"Error loading checksums: {e}")
+                logger.error("Error loading checksums: %s", e)
         return {}
 
     def save_checksums(self):
@@ -57,7 +118,7 @@ class JellyfinDataFetcher:
                 pickle.dump(self.checksums, f)
             self.set_permissions(self.checksums_file)
         except Exception as e:
-            print(f"Error saving checksums: {e}")
+            logger.error("Error saving checksums: %s", e)
 
     def set_permissions(self, path):
         """Set permissions to www-data:www-data"""
@@ -65,9 +126,9 @@ class JellyfinDataFetcher:
             try:
                 os.chown(path, self.www_data_uid, self.www_data_gid)
             except PermissionError:
-                print(f"Warning: Insufficient permissions to change ownership of {path}. Run as root/sudo.")
+                logger.warning("Insufficient permissions to change ownership of %s. Run as root/sudo.", path)
             except Exception as e:
-                print(f"Error setting permissions for {path}: {e}")
+                logger.error("Error setting permissions for %s: %s", path, e)
 
     def setup_directories(self):
         """Create necessary directory structure"""
@@ -82,19 +143,6 @@ class JellyfinDataFetcher:
             directory.mkdir(parents=True, exist_ok=True)
             self.set_permissions(directory)
 
-    def clean_existing_data(self):
-        """Remove existing JSON files to ensure clean data"""
-        movies_file = self.output_dir / "movies.json"
-        tvshows_file = self.output_dir / "tvshows.json"
-        
-        for file_path in [movies_file, tvshows_file]:
-            if file_path.exists():
-                try:
-                    file_path.unlink()
-                    print(f"Removed existing file: {file_path}")
-                except Exception as e:
-                    print(f"Warning: Could not remove {file_path}: {e}")
-
     def is_library_excluded(self, library_name, library_id):
         """Check if a library should be excluded based on name or ID"""
         if not self.excluded_libraries:
@@ -113,10 +161,10 @@ class JellyfinDataFetcher:
             if users:
                 return users[0]['Id']
             else:
-                print("Error: No users found")
+                logger.error("No users found")
                 return None
         except requests.RequestException as e:
-            print(f"Error fetching users: {e}")
+            logger.error("Error fetching users: %s", e)
             return None
 
     def fetch_libraries(self, user_id):
@@ -126,24 +174,45 @@ class JellyfinDataFetcher:
             response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
-            print(f"Error fetching libraries: {e}")
+            logger.error("Error fetching libraries: %s", e)
             return None
 
+    def can_fetch_combined(self, libraries):
+        """Check if movies and series of all libraries can be listed with a single query"""
+        # Exclusions and refresh intervals need the libraries listed one by one
+        if self.excluded_libraries or self.library_schedule:
+            return False
+        
+        # Mixed content folders may hold movies or series that the per-library sync skips
+        return all(library.get('CollectionType') in COMBINED_LIBRARY_TYPES for library in libraries)
+
     def fetch_library_content(self, user_id, library_id, media_type):
-        """Fetch all content from a specific library using pagination"""
+        """Fetch all content from a specific library (or all libraries if library_id is None) using pagination.
+
+        Raises IncompleteLibraryError if a page fails or fewer items than the reported TotalRecordCount were listed.
+        """
         all_items = []
         start_index = 0
+        total = None
         
         while True:
             try:
                 params = {
-                    "ParentId": library_id,
                     "StartIndex": start_index,
                     "Limit": self.page_size,
                     "Recursive": "true",
-                    "Fields": "Overview,Genres,People,Studios,DateCreated,RunTimeTicks,ProviderIds,ImageTags,BackdropImageTags",
-                    "IncludeItemTypes": "Movie" if media_type == "movie" else "Series"
+                    "SortBy": "SortName",
+                    "Fields": "Overview,Genres,People,Studios,DateCreated,DateLastSaved,DateLastMediaAdded,RunTimeTicks,ProviderIds,ImageTags,BackdropImageTags,Taglines",
+                    "IncludeItemTypes": LIST_ITEM_TYPES[media_type],
+                    # Lean listing: no per-user data, only the image types we download, one backdrop tag
+                    "EnableUserData": "false",
+                    "EnableImageTypes": "Primary,Backdrop",
+                    "ImageTypeLimit": 1,
+                    # Counting all matches is only worth it once, not on every page
+                    "EnableTotalRecordCount": "true" if start_index == 0 else "false"
                 }
+                if library_id:
+                    params["ParentId"] = library_id
                 
                 response = self.session.get(
                     f"{self.jellyfin_url}/Users/{user_id}/Items",
@@ -152,19 +221,20 @@ class JellyfinDataFetcher:
                 response.raise_for_status()
                 data = response.json()
                 
-                print(f"API Response status: {response.status_code}")
-                print(f"API Response data keys: {list(data.keys()) if data else 'No data'}")
+                if start_index == 0 and 'TotalRecordCount' in data:
+                    total = data['TotalRecordCount']
+                    logger.debug("Server reports %d items", total)
                 
                 items = data.get('Items', [])
                 items_count = len(items)
                 
                 if not items:
-                    print(f"No items found for library {library_id}")
+                    logger.debug("No more items for library %s", library_id or "(all)")
                     break
                     
                 all_items.extend(items)
                 
-                print(f"  Fetched {items_count} items (offset: {start_index})")
+                logger.debug("Fetched %d items (offset: %d)", items_count, start_index)
                 
                 # If we got fewer items than requested, we've reached the end
                 if items_count < self.page_size:
@@ -174,18 +244,21 @@ class JellyfinDataFetcher:
                 start_index += self.page_size
                 
                 # Small delay to reduce server stress
-                time.sleep(0.5)
+                self.profiler.pause(0.5)
                 
             except requests.RequestException as e:
-                print(f"Error fetching library content (offset: {start_index}): {e}")
-                print(f"Response status: {getattr(e.response, 'status_code', 'No response')}")
-                print(f"Response text: {getattr(e.response, 'text', 'No response text')}")
-                break
+                logger.debug("Response text: %s", getattr(e.response, 'text', 'No response text'))
+                raise IncompleteLibraryError(f"Error fetching library content (offset: {start_index}): {e}",
+                                             all_items) from e
         
+        check_listing(all_items, total, f"Library {library_id or ALL_LIBRARIES}")
         return all_items
 
     def get_series_info(self, user_id, series_id):
-        """Get additional series information like episode and season count"""
+        """Get additional series information like episode and season count.
+
+        Episodes are only counted (Limit=0), their details are left to the season detail files.
+        """
         try:
             # Get seasons
             seasons_response = self.session.get(
@@ -195,21 +268,21 @@ class JellyfinDataFetcher:
             seasons_response.raise_for_status()
             seasons_data = seasons_response.json()
             
-            # Get episodes
+            # Count episodes without listing them
             episodes_response = self.session.get(
                 f"{self.jellyfin_url}/Shows/{series_id}/Episodes",
-                params={"UserId": user_id}
+                params={"UserId": user_id, "Limit": 0, "EnableTotalRecordCount": "true"}
             )
             episodes_response.raise_for_status()
             episodes_data = episodes_response.json()
             
             return {
                 "season_count": len(seasons_data.get('Items', [])),
-                "episode_count": len(episodes_data.get('Items', []))
+                "episode_count": episodes_data.get('TotalRecordCount', len(episodes_data.get('Items', [])))
             }
             
         except requests.RequestException as e:
-            print(f"Error fetching series info for {series_id}: {e}")
+            logger.error("Error fetching series info for %s: %s", series_id, e)
             return {"season_count": 0, "episode_count": 0}
 
     def calculate_remote_md5(self, image_url):
@@ -224,7 +297,7 @@ class JellyfinDataFetcher:
             
             return md5_hash.hexdigest()
         except requests.RequestException as e:
-            print(f"Error calculating MD5 for {image_url}: {e}")
+            logger.error("Error calculating MD5 for %s: %s", image_url, e)
             return None
 
     def download_image(self, image_url, output_path):
@@ -239,6 +312,7 @@ class JellyfinDataFetcher:
             # Calculate new MD5 checksum
             new_md5 = self.calculate_remote_md5(image_url)
             if not new_md5:
+                self.image_stats['failed'] += 1
                 return False
             
             # Check if file exists and compare checksums
@@ -248,17 +322,23 @@ class JellyfinDataFetcher:
                 
                 # If checksums match, file hasn't changed
                 if old_md5 and old_md5 == new_md5:
-                    print(f"Image unchanged, skipping: {output_path.name}")
+                    logger.debug("Image unchanged, skipping: %s", output_path.name)
+                    self.image_stats['unchanged'] += 1
                     return True
                 else:
-                    print(f"Image changed, downloading: {output_path.name}")
+                    logger.debug("Image changed, downloading: %s", output_path.name)
+                    self.image_stats['changed'] += 1
             else:
-                print(f"New image, downloading: {output_path.name}")
+                logger.debug("New image, downloading: %s", output_path.name)
+                self.image_stats['new'] += 1
             
             # Download the image
             response = self.session.get(image_url)
             response.raise_for_status()
             
+            # Replace rather than overwrite, the file may be hard linked from another catalog
+            if output_path.exists():
+                output_path.unlink()
             with open(output_path, 'wb') as f:
                 f.write(response.content)
             
@@ -270,14 +350,85 @@ class JellyfinDataFetcher:
             
             return True
         except requests.RequestException as e:
-            print(f"Error downloading image {image_url}: {e}")
+            logger.error("Error downloading image %s: %s", image_url, e)
+            self.image_stats['failed'] += 1
             return False
 
-    def process_media_item(self, item, media_type, user_id):
+    def link_shared_artwork(self, media_info, media_type, kind, image_url, output_path, version):
+        """Hard link artwork another server already downloaded for a title this server has no own artwork for.
+
+        version changes with the server's own image, which then replaces the link.
+        """
+        if not self.shared_artwork:
+            return False
+        
+        checksum_key = f"{image_url}|{output_path}"
+        previous_state = self.checksums.get(checksum_key)
+        state = self.shared_artwork.link(media_info, media_type, kind, output_path, previous_state, version)
+        if state is None:
+            return False
+        
+        # Record the shared file so previews and later downloads see it as a known image
+        self.checksums[checksum_key] = state
+        self.image_stats['unchanged' if state == previous_state else 'shared'] += 1
+        return True
+
+    def record_image_ref(self, image_url, output_path, ref):
+        """Record an image for the on-demand image proxy instead of downloading it"""
+        self.image_refs[output_path.relative_to(self.output_dir).as_posix()] = ref
+        
+        # The reference changes with the image, so it doubles as change detection state for previews
+        checksum_key = f"{image_url}|{output_path}"
+        if self.checksums.get(checksum_key) != f"ref:{ref}":
+            # Drop an earlier download so nginx falls through to the proxy
+            if output_path.exists():
+                output_path.unlink()
+            self.checksums[checksum_key] = f"ref:{ref}"
+        self.image_stats['lazy'] += 1
+        return True
+
+    def fetch_image_preview(self, image_url, output_path):
+        """Fetch a tiny rendition of an image as a base64 data URI for inline placeholders"""
+        if not image_url or not self.preview_width:
+            return None
+        
+        # Previews share the change detection state of the full image they belong to
+        image_md5 = self.checksums.get(f"{image_url}|{output_path}")
+        preview_key = f"preview|{output_path}"
+        cached_preview = self.checksums.get(preview_key)
+        if image_md5 and cached_preview and cached_preview.get('md5') == image_md5:
+            return cached_preview['data']
+        
+        try:
+            # Ask the server for a scaled down, low quality rendition of the poster
+            response = self.session.get(
+                image_url,
+                params={"maxWidth": self.preview_width, "quality": 50}
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.error("Error fetching preview for %s: %s", image_url, e)
+            return None
+        
+        content_type = response.headers.get('Content-Type', 'image/jpeg').split(';')[0]
+        preview = f"data:{content_type};base64,{base64.b64encode(response.content).decode('ascii')}"
+        
+        if image_md5:
+            self.checksums[preview_key] = {'md5': image_md5, 'data': preview}
+        
+        return preview
+
+    @staticmethod
+    def parse_timestamp(value):
+        """Convert a Jellyfin ISO datetime to a Unix timestamp, or 0 if it cannot be parsed"""
+        try:
+            return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp())
+        except (AttributeError, ValueError):
+            return 0
+
+    def process_media_item(self, item, media_type, user_id, enrich=True):
         """Process a single media item and extract relevant metadata"""
         try:
-            print(f"Processing item: {item.get('Name', 'Unknown')} (Type: {item.get('Type', 'Unknown')})")
-            
             # Convert Jellyfin timestamp to Unix timestamp (like Plex uses)
             added_at = 0
             if 'DateCreated' in item:
@@ -285,10 +436,13 @@ class JellyfinDataFetcher:
                     # Parse Jellyfin's ISO datetime format
                     dt = datetime.fromisoformat(item['DateCreated'].replace('Z', '+00:00'))
                     added_at = int(dt.timestamp())
-                    print(f"  Parsed date: {item['DateCreated']} -> {added_at}")
                 except Exception as e:
-                    print(f"  Error parsing date {item['DateCreated']}: {e}")
+                    logger.warning("Error parsing date %s: %s", item['DateCreated'], e)
                     added_at = 0
+            
+            # Last metadata save, or the newest episode of a series if later, so changes show up in updatedAt
+            updated_at = max([added_at] + [self.parse_timestamp(item[field])
+                                           for field in ('DateLastSaved', 'DateLastMediaAdded') if item.get(field)])
 
             # Extract common fields
             media_info = {
@@ -299,22 +453,26 @@ class JellyfinDataFetcher:
                 'rating': item.get('CommunityRating', ''),
                 'studio': '',
                 'addedAt': added_at,
-                'updatedAt': added_at,
+                'updatedAt': updated_at,
                 'genres': [],
-                'actors': []
+                'actors': [],
+                'providerIds': {}
             }
             
-            print(f"  Basic info: ID={media_info['id']}, Title={media_info['title']}, Year={media_info['year']}")
-            
             # Extract studio information
             if 'Studios' in item and item['Studios']:
                 media_info['studio'] = item['Studios'][0].get('Name', '')
-                print(f"  Studio: {media_info['studio']}")
+            
+            # Extract external provider IDs used to match titles across servers
+            if 'ProviderIds' in item and item['ProviderIds']:
+                media_info['providerIds'] = {
+                    provider.lower(): str(external_id)
+                    for provider, external_id in item['ProviderIds'].items() if external_id
+                }
             
             # Extract genre information
             if 'Genres' in item:
                 media_info['genres'] = item['Genres']
-                print(f"  Genres: {media_info['genres']}")
             
             # Extract actor information (limit to main 3 cast members)
             if 'People' in item:
@@ -327,7 +485,6 @@ class JellyfinDataFetcher:
                         }
                         media_info['actors'].append(actor_info)
                         actors_count += 1
-                print(f"  Cast: {len(media_info['actors'])} actors")
             
             if media_type == 'movie':
                 # Convert runtime from ticks to milliseconds (like Plex format)
@@ -335,7 +492,6 @@ class JellyfinDataFetcher:
                 if 'RunTimeTicks' in item:
                     # Jellyfin uses ticks (100 nanoseconds), convert to milliseconds
                     duration_ms = item['RunTimeTicks'] // 10000
-                    print(f"  Runtime: {item['RunTimeTicks']} ticks -> {duration_ms} ms")
                 
                 media_info.update({
                     'duration': duration_ms,
@@ -344,9 +500,12 @@ class JellyfinDataFetcher:
                     'tagline': item.get('Taglines', [''])[0] if item.get('Taglines') else ''
                 })
             elif media_type == 'tvshow':
-                # Get series info for episode and season counts
-                series_info = self.get_series_info(user_id, item['Id'])
-                print(f"  Series info: {series_info['season_count']} seasons, {series_info['episode_count']} episodes")
+                # Get series info for episode and season counts (skipped for listing-only records)
+                if enrich:
+                    with self.profiler.phase('series_counts'):
+                        series_info = self.get_series_info(user_id, item['Id'])
+                else:
+                    series_info = {"season_count": '', "episode_count": ''}
                 
                 media_info.update({
                     'leafCount': series_info['episode_count'],  # episode count
@@ -355,141 +514,312 @@ class JellyfinDataFetcher:
                     'originallyAvailableAt': item.get('PremiereDate', '')
                 })
             
-            print(f"  ✓ Successfully processed: {media_info['title']}")
             return media_info
         except Exception as e:
-            print(f"  ✗ Error processing media item {item.get('Name', 'Unknown')}: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error processing media item %s: %s", item.get('Name', 'Unknown'), e)
             return None
 
-    def fetch_and_save_data(self):
-        """Main method to fetch all data and save it"""
-        print(f"Starting Jellyfin data fetch at {datetime.now()}")
-        print(f"Jellyfin URL: {self.jellyfin_url}")
-        
-        if self.excluded_libraries:
-            print(f"Excluded libraries: {', '.join(self.excluded_libraries)}")
-        
-        # Clean existing data files
-        self.clean_existing_data()
+    def process_poster(self, item, media_info, media_type):
+        """Download or link an item's poster (Primary image) and attach its inline preview"""
+        if 'ImageTags' not in item or 'Primary' not in item['ImageTags']:
+            logger.debug("No poster available for: %s", media_info['title'])
+            return
         
-        # Get user ID
-        user_id = self.get_user_id()
-        if not user_id:
-            print("Failed to get user ID")
+        poster_url = f"{self.jellyfin_url}/Items/{item['Id']}/Images/Primary"
+        poster_path = self.output_dir / "posters" / f"{media_type}s" / f"{media_info['id']}.jpg"
+        if 'poster' in self.lazy_kinds:
+            # The image tag makes the reference change whenever the poster does
+            poster_ref = f"/Items/{item['Id']}/Images/Primary?tag={item['ImageTags']['Primary']}"
+            success = self.record_image_ref(poster_url, poster_path, poster_ref)
+        else:
+            success = (self.link_shared_artwork(media_info, media_type, 'poster', poster_url, poster_path,
+                                                item['ImageTags']['Primary']) or
+                       self.download_image(poster_url, poster_path))
+        if success:
+            preview = self.fetch_image_preview(poster_url, poster_path)
+            if preview:
+                media_info['posterPreview'] = preview
+        else:
+            logger.warning("Failed to process poster for: %s", media_info['title'])
+
+    def process_backdrop(self, item, media_info, media_type):
+        """Download or link an item's first backdrop image if available"""
+        if not item.get('BackdropImageTags'):
+            logger.debug("No backdrop available for: %s", media_info['title'])
             return
         
-        print(f"Using user ID: {user_id}")
+        backdrop_url = f"{self.jellyfin_url}/Items/{item['Id']}/Images/Backdrop/0"
+        backdrop_path = self.output_dir / "backdrops" / f"{media_type}s" / f"{media_info['id']}.jpg"
+        if 'backdrop' in self.lazy_kinds:
+            backdrop_ref = f"/Items/{item['Id']}/Images/Backdrop/0?tag={item['BackdropImageTags'][0]}"
+            success = self.record_image_ref(backdrop_url, backdrop_path, backdrop_ref)
+        else:
+            success = (self.link_shared_artwork(media_info, media_type, 'backdrop', backdrop_url, backdrop_path,
+                                                item['BackdropImageTags'][0]) or
+                       self.download_image(backdrop_url, backdrop_path))
+        if not success:
+            logger.warning("Failed to process backdrop for: %s", media_info['title'])
+
+    def publish_catalog(self, movies_data, tvshows_data):
+        """Save both catalogs and the version manifest, returning the manifest"""
+        with self.profiler.phase('publish'):
+            # Save JSON files as compact JSON with precompressed .gz/.br sidecars
+            publisher = CatalogPublisher(self.output_dir, self.set_permissions, self.change_generations)
+            movies_file = self.output_dir / "movies.json"
+            tvshows_file = self.output_dir / "tvshows.json"
+            
+            logger.info("Saving %d movies to: %s", len(movies_data), movies_file)
+            movies_result = publisher.publish_json(movies_file.name, movies_data, versioned=True)
+            
+            logger.info("Saving %d TV shows to: %s", len(tvshows_data), tvshows_file)
+            tvshows_result = publisher.publish_json(tvshows_file.name, tvshows_data, versioned=True)
+            
+            # Search index over titles, cast and studios, versioned together with the catalogs it points into
+            search_index = build_search_index(movies_data, tvshows_data)
+            search_result = publisher.publish_json(SEARCH_INDEX_FILE, search_index, versioned=True)
+            
+            # Columnar copies of both catalogs, smaller to download and parse for very large libraries
+            catalogs = {movies_file.name: movies_data, tvshows_file.name: tvshows_data}
+            columnar_results = publish_columnar_catalogs(publisher, catalogs, self.columnar)
+            
+            # Publish the version manifest the service worker checks before using cached catalogs
+            manifest = publisher.publish_manifest([movies_result, tvshows_result, search_result] + columnar_results,
+                                                  catalogs)
+            logger.info("Published data version: %s", manifest['version'])
+            
+            # Image references the on-demand image proxy resolves lazily loaded images with
+            if self.lazy_kinds:
+                publisher.publish_json(IMAGE_REFS_FILE, self.image_refs)
+            else:
+                for suffix in ('', '.gz', '.br'):
+                    (self.output_dir / f"{IMAGE_REFS_FILE}{suffix}").unlink(missing_ok=True)
+            
+            # Libraries of this catalog whose listing was complete, the fallback of the next run
+            publisher.publish_json(LIBRARY_STATE_FILE, self.library_state.libraries)
+            
+            # Save checksums
+            self.save_checksums()
         
-        # Get all libraries
-        libraries_data = self.fetch_libraries(user_id)
+        return manifest
+
+    def list_libraries(self, user_id):
+        """Return the libraries to list as (name, media type, ID), or None if they could not be fetched.
+
+        A None media type and ID lists movies and series of all libraries together.
+        """
+        with self.profiler.phase('listing'):
+            libraries_data = self.fetch_libraries(user_id)
         if not libraries_data or 'Items' not in libraries_data:
-            print("Failed to fetch libraries")
-            print(f"Libraries response: {libraries_data}")
-            return
+            logger.error("Failed to fetch libraries")
+            logger.debug("Libraries response: %s", libraries_data)
+            return None
         
         libraries = libraries_data['Items']
-        print(f"Found {len(libraries)} libraries")
+        logger.info("Found %d libraries", len(libraries))
         
-        movies_data = []
-        tvshows_data = []
+        if self.can_fetch_combined(libraries):
+            logger.info("No libraries excluded - listing movies and series of all libraries in a single query")
+            return [("All libraries", None, None)]
         
+        library_batches = []
         for library in libraries:
             library_id = library.get('Id')
             library_type = library.get('CollectionType')
             library_name = library.get('Name')
             
-            print(f"\nProcessing library: {library_name} (Type: {library_type}, ID: {library_id})")
-            
             # Check if this library should be excluded
             if self.is_library_excluded(library_name, library_id):
-                print(f"Skipping excluded library: {library_name}")
+                logger.info("Skipping excluded library: %s", library_name)
                 continue
             
             if library_type not in ['movies', 'tvshows']:
-                print(f"Skipping unsupported library type: {library_type}")
+                logger.debug("Skipping unsupported library: %s (Type: %s)", library_name, library_type)
                 continue
             
-            # Fetch content for this library
-            media_type = 'movie' if library_type == 'movies' else 'tvshow'
-            items = self.fetch_library_content(user_id, library_id, media_type)
-            
-            print(f"Found {len(items)} items in {library_name}")
-            
+            library_batches.append((library_name, 'movie' if library_type == 'movies' else 'tvshow', library_id))
+        
+        return library_batches
+
+    @staticmethod
+    def item_media_type(item, library_media_type):
+        """Return the media type of a listed item, taken from its Type in combined listings"""
+        return library_media_type or ('movie' if item.get('Type') == 'Movie' else 'tvshow')
+
+    def list_library_items(self, user_id, library):
+        """List the items of a (name, media type, ID) library, raising IncompleteLibraryError on failure"""
+        library_name, library_media_type, library_id = library
+        logger.info("Processing library: %s (ID: %s)", library_name, library_id or "all")
+        
+        # Fetch content for this library
+        with self.profiler.phase('listing'):
+            items = self.fetch_library_content(user_id, library_id, library_media_type)
+        
+        logger.info("Found %d items in %s", len(items), library_name)
+        return items
+
+    def process_library_items(self, user_id, library_name, library_media_type, items):
+        """Fully process the listed items of a library, returning their (item, media type, media info) entries"""
+        entries = []
+        self.image_stats = Counter()
+        failed_items = 0
+        progress = ProgressReporter(logger, f"Library '{library_name}'", len(items))
+        
+        with self.profiler.phase('items'):
             for i, item in enumerate(items):
-                print(f"Processing item {i+1}/{len(items)}: {item.get('Name', 'Unknown')}")
-                media_info = self.process_media_item(item, media_type, user_id)
+                logger.debug("Processing item %d/%d: %s", i + 1, len(items), item.get('Name', 'Unknown'))
+                media_type = self.item_media_type(item, library_media_type)
+                with self.profiler.phase('details'):
+                    media_info = self.process_media_item(item, media_type, user_id)
                 
                 if media_info:
-                    # Determine output paths
-                    poster_dir = self.output_dir / "posters" / f"{media_type}s"
-                    poster_path = poster_dir / f"{media_info['id']}.jpg"
-                    
-                    # Download poster (Primary image)
-                    if 'ImageTags' in item and 'Primary' in item['ImageTags']:
-                        poster_url = f"{self.jellyfin_url}/Items/{item['Id']}/Images/Primary"
-                        print(f"Downloading poster from: {poster_url}")
-                        success = self.download_image(poster_url, poster_path)
-                        if success:
-                            print(f"✓ Processed poster for: {media_info['title']}")
-                        else:
-                            print(f"✗ Failed to process poster for: {media_info['title']}")
-                    else:
-                        print(f"No poster available for: {media_info['title']}")
-                    
-                    # Download backdrop (Backdrop image)
-                    if 'BackdropImageTags' in item and item['BackdropImageTags']:
-                        backdrop_dir = self.output_dir / "backdrops" / f"{media_type}s"
-                        backdrop_path = backdrop_dir / f"{media_info['id']}.jpg"
-                        backdrop_url = f"{self.jellyfin_url}/Items/{item['Id']}/Images/Backdrop/0"
-                        print(f"Downloading backdrop from: {backdrop_url}")
-                        success = self.download_image(backdrop_url, backdrop_path)
-                        if success:
-                            print(f"✓ Processed backdrop for: {media_info['title']}")
-                        else:
-                            print(f"✗ Failed to process backdrop for: {media_info['title']}")
-                    else:
-                        print(f"No backdrop available for: {media_info['title']}")
-                    
-                    # Add to appropriate list
-                    if media_type == 'movie':
-                        movies_data.append(media_info)
-                    else:
-                        tvshows_data.append(media_info)
+                    with self.profiler.phase('image_hash'):
+                        self.process_poster(item, media_info, media_type)
+                        self.process_backdrop(item, media_info, media_type)
+                    entries.append((item, media_type, media_info))
                 else:
-                    print(f"Failed to process media info for: {item.get('Name', 'Unknown')}")
+                    failed_items += 1
+                
+                progress.update()
         
-        # Save JSON files
-        movies_file = self.output_dir / "movies.json"
-        tvshows_file = self.output_dir / "tvshows.json"
+        progress.finish(failed_items=failed_items, **self.image_stats)
+        return entries
+
+    def list_library_records(self, user_id, library_name, library_media_type, items):
+        """Build listing-only entries for the items of a library, without any further requests"""
+        entries = []
+        for item in items:
+            media_type = self.item_media_type(item, library_media_type)
+            media_info = self.process_media_item(item, media_type, user_id, enrich=False)
+            if media_info:
+                entries.append((item, media_type, media_info))
+        return entries
+
+    def refresh_seasons(self, user_id):
+        """Rebuild the season detail of shows someone opened whose updatedAt or episode count changed"""
+        tvshows_data = split_catalog(self.library_state.all_entries())[1]
+        with self.profiler.phase('seasons'):
+            stats = refresh_season_details(self.output_dir, tvshows_data,
+                                           lambda show_id: fetch_jellyfin_seasons(self.session, self.jellyfin_url, show_id,
+                                                                                  user_id=user_id),
+                                           self.set_permissions)
+        if stats:
+            logger.info("Season detail of opened shows: %s", ', '.join(f"{count} {outcome}" for outcome, count in stats.items()))
+
+    def publish_library_entries(self):
+        """Publish the catalog of all libraries, synced or standing in from the last complete sync"""
+        return self.publish_catalog(*split_catalog(self.library_state.all_entries()))
+
+    def retry_failed_libraries(self, user_id, failed_libraries):
+        """Retry libraries whose listing failed, republishing the catalog whenever one recovers"""
+        self.library_state.retry(failed_libraries, self.retry_delays,
+                                 lambda library: self.list_library_items(user_id, library),
+                                 lambda *args: self.process_library_items(user_id, *args),
+                                 self.publish_library_entries)
+
+    def fetch_and_save_data(self):
+        """Main method to fetch all data and save it"""
+        logger.info("Starting Jellyfin data fetch from %s", self.jellyfin_url)
+        
+        if self.excluded_libraries:
+            logger.info("Excluded libraries: %s", ', '.join(self.excluded_libraries))
+        
+        if self.library_schedule:
+            logger.info("Library refresh intervals: %s", ', '.join(
+                f"{library} every {format_duration(interval)}" for library, interval in self.library_schedule.intervals.items()))
+        
+        # Get user ID
+        with self.profiler.phase('listing'):
+            user_id = self.get_user_id()
+        if not user_id:
+            logger.error("Failed to get user ID")
+            return
         
-        print(f"\nSaving {len(movies_data)} movies to: {movies_file}")
-        with open(movies_file, 'w') as f:
-            json.dump(movies_data, f, indent=2)
-        self.set_permissions(movies_file)
+        logger.debug("Using user ID: %s", user_id)
         
-        print(f"Saving {len(tvshows_data)} TV shows to: {tvshows_file}")
-        with open(tvshows_file, 'w') as f:
-            json.dump(tvshows_data, f, indent=2)
-        self.set_permissions(tvshows_file)
+        # Get all libraries
+        library_batches = self.list_libraries(user_id)
+        if library_batches is None:
+            return
+        
+        if self.prioritized:
+            return self.fetch_and_save_data_prioritized(user_id, library_batches)
+        
+        # Each library is listed and processed on its own; failed ones keep their last complete data
+        failed_libraries = self.library_state.sync(library_batches,
+                                                   lambda library: self.list_library_items(user_id, library),
+                                                   lambda *args: self.process_library_items(user_id, *args))
+        self.publish_library_entries()
+        self.retry_failed_libraries(user_id, failed_libraries)
+        self.refresh_seasons(user_id)
+        
+        movies_data, tvshows_data = split_catalog(self.library_state.all_entries())
+        logger.info("Data fetch completed: %d movies, %d TV shows saved to %s",
+                    len(movies_data), len(tvshows_data), self.output_dir)
+
+    def fetch_and_save_data_prioritized(self, user_id, library_batches):
+        """Sync in order of what the grid needs first, publishing the catalog at each milestone.
+
+        1. Listing-only records for every item, plus posters of the newest items
+        2. Posters of all remaining items, newest first
+        3. Backdrops and detail enrichment (series season and episode counts)
+
+        Libraries that fail keep their last complete data through all milestones and are retried at the end.
+        """
+        failed_libraries = self.library_state.sync(library_batches,
+                                                   lambda library: self.list_library_items(user_id, library),
+                                                   lambda *args: self.list_library_records(user_id, *args))
+        
+        # Records standing in for failed libraries are complete already, only listed items need work
+        entries = [entry for entry in self.library_state.all_entries() if entry[0] is not None]
+        
+        # Artwork goes newest first; the catalog itself keeps the listing order
+        by_newest = sorted(entries, key=lambda entry: entry[2]['addedAt'], reverse=True)
+        
+        # Keep last run's enrichment visible until this run refreshes it
+        carry_over_enrichment([media_info for _, _, media_info in entries], self.output_dir, ENRICHED_FIELDS)
         
-        # Save checksums
-        self.save_checksums()
+        stages = [
+            ("Newest posters", by_newest[:self.priority_items]),
+            ("Remaining posters", by_newest[self.priority_items:])
+        ]
+        for label, stage_entries in stages:
+            self.image_stats = Counter()
+            progress = ProgressReporter(logger, label, len(stage_entries))
+            with self.profiler.phase('posters'):
+                for item, media_type, media_info in stage_entries:
+                    self.process_poster(item, media_info, media_type)
+                    progress.update()
+            progress.finish(**self.image_stats)
+            manifest = self.publish_library_entries()
+            logger.info("Milestone '%s' published (version %s)", label, manifest['version'])
+        
+        self.image_stats = Counter()
+        failed_items = 0
+        progress = ProgressReporter(logger, "Backdrops and details", len(entries))
+        with self.profiler.phase('enrichment'):
+            for item, media_type, media_info in entries:
+                if media_type == 'tvshow':
+                    with self.profiler.phase('details'):
+                        detailed_info = self.process_media_item(item, media_type, user_id)
+                    if detailed_info:
+                        media_info.update(detailed_info)
+                    else:
+                        failed_items += 1
+                with self.profiler.phase('image_hash'):
+                    self.process_backdrop(item, media_info, media_type)
+                progress.update()
+        progress.finish(failed_items=failed_items, **self.image_stats)
         
-        print(f"\nData fetch completed at {datetime.now()}")
-        print(f"Movies: {len(movies_data)}")
-        print(f"TV Shows: {len(tvshows_data)}")
-        print(f"Data saved to: {self.output_dir}")
+        manifest = self.publish_library_entries()
+        logger.info("Milestone 'Backdrops and details' published (version %s)", manifest['version'])
         
-        # List the files that were created
-        print(f"\nFiles created:")
-        if movies_file.exists():
-            print(f"✓ {movies_file} ({movies_file.stat().st_size} bytes)")
-        if tvshows_file.exists():
-            print(f"✓ {tvshows_file} ({tvshows_file.stat().st_size} bytes)")
+        # Libraries recovering on a retry are processed in full, there are no milestones left to spread them over
+        self.retry_failed_libraries(user_id, failed_libraries)
+        self.refresh_seasons(user_id)
         
-        print(f"\nDirectory contents: {list(self.output_dir.iterdir())}")
+        movies_data, tvshows_data = split_catalog(self.library_state.all_entries())
+        logger.info("Data fetch completed: %d movies, %d TV shows saved to %s",
+                    len(movies_data), len(tvshows_data), self.output_dir)
 
 def main():
     # Get values from environment variables first
@@ -497,10 +827,21 @@ def main():
     default_token = os.environ.get('JELLYFIN_TOKEN', '')
     default_output = os.environ.get('OUTPUT_DIR', 'data/jellyfin')
     default_page_size = int(os.environ.get('PAGE_SIZE', '100'))
+    default_preview_width = int(os.environ.get('PREVIEW_WIDTH', '20'))
+    default_shared_artwork_index = os.environ.get('SHARED_ARTWORK_INDEX', '')
+    default_shared_artwork_servers = os.environ.get('MERGE_SERVERS', ','.join(DEFAULT_MERGE_SERVERS))
+    default_log_level = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    default_lazy_images = os.environ.get('LAZY_IMAGES', 'off').lower()
+    default_prioritized = os.environ.get('PRIORITIZED_SYNC', 'false').lower() == 'true'
+    default_priority_items = int(os.environ.get('PRIORITY_ITEMS', str(DEFAULT_PRIORITY_ITEMS)))
+    default_retry_delays = os.environ.get('LIBRARY_RETRY_DELAYS', DEFAULT_RETRY_DELAYS)
+    default_change_generations = int(os.environ.get('CHANGE_GENERATIONS', str(DEFAULT_CHANGE_GENERATIONS)))
+    default_columnar = os.environ.get('COLUMNAR_CATALOG', 'false').lower() == 'true'
     
     # Get excluded libraries from environment variable
     excluded_libraries_str = os.environ.get('JELLYFIN_EXCLUDE_LIBRARIES', '')
     excluded_libraries = [lib.strip() for lib in excluded_libraries_str.split(',') if lib.strip()] if excluded_libraries_str else []
+    default_library_intervals = os.environ.get('JELLYFIN_LIBRARY_INTERVALS', '')
     
     parser = argparse.ArgumentParser(description='Fetch Jellyfin media data and posters')
     
@@ -509,8 +850,35 @@ def main():
     parser.add_argument('--token', default=default_token, help='Jellyfin API token')
     parser.add_argument('--output', default=default_output, help='Output directory (default: data/jellyfin)')
     parser.add_argument('--page-size', type=int, default=default_page_size, help='Number of items per page (default: 100)')
+    parser.add_argument('--preview-width', type=int, default=default_preview_width,
+                        help='Width in pixels of inline poster previews, 0 to disable (default: 20)')
+    parser.add_argument('--shared-artwork-index', default=default_shared_artwork_index,
+                        help='Artwork index written by catalog_merger.py, reuses artwork other servers already downloaded')
+    parser.add_argument('--shared-artwork-servers', default=default_shared_artwork_servers,
+                        type=lambda value: [server.strip() for server in value.split(',') if server.strip()],
+                        help='Servers to reuse artwork from, preferred first (default: plex,jellyfin,emby)')
+    parser.add_argument('--log-level', default=default_log_level, choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='Logging level, DEBUG adds per-item detail (default: INFO)')
+    parser.add_argument('--verbose', action='store_true', help='Shortcut for --log-level DEBUG')
+    parser.add_argument('--profile', action='store_true',
+                        help='Record cProfile and tracemalloc data per sync phase into <output>/profile')
+    parser.add_argument('--lazy-images', default=default_lazy_images, choices=list(LAZY_IMAGE_MODES),
+                        help='Leave backdrops or all images to the on-demand image proxy instead of downloading them (default: off)')
+    parser.add_argument('--prioritized', action='store_true', default=default_prioritized,
+                        help='Publish newest posters first, then remaining posters, then backdrops and details')
+    parser.add_argument('--priority-items', type=int, default=default_priority_items,
+                        help=f'Newest items whose posters come with the first publish (default: {DEFAULT_PRIORITY_ITEMS})')
+    parser.add_argument('--retry-delays', type=parse_retry_delays, default=default_retry_delays,
+                        help=f'Seconds to wait before each retry of libraries that failed, "off" for none (default: {DEFAULT_RETRY_DELAYS})')
+    parser.add_argument('--change-generations', type=int, default=default_change_generations,
+                        help=f'Catalog generations to keep change files for, 0 disables them (default: {DEFAULT_CHANGE_GENERATIONS})')
+    parser.add_argument('--columnar', action='store_true', default=default_columnar,
+                        help='Also publish columnar copies of the catalogs (movies.columns.json) for very large libraries')
     parser.add_argument('--exclude-libraries', nargs='*', default=excluded_libraries, 
                         help='Libraries to exclude (library names or IDs, space-separated)')
+    parser.add_argument('--library-intervals', type=parse_library_intervals, default=default_library_intervals,
+                        help='Refresh intervals of individual libraries as comma-separated <name or ID>=<interval> '
+                             'pairs, e.g. "New Releases=1h,Archive=7d"; other libraries sync on every run')
     
     # Handle special case for tokens with leading hyphens
     for i, arg in enumerate(sys.argv):
@@ -519,17 +887,28 @@ def main():
             break
     
     args = parser.parse_args()
+    setup_logging('DEBUG' if args.verbose else args.log_level)
     
     # Validate required parameters
     if not args.url:
-        print("Error: Jellyfin URL is required. Set with --url or JELLYFIN_URL environment variable.")
+        logger.error("Jellyfin URL is required. Set with --url or JELLYFIN_URL environment variable.")
         sys.exit(1)
     if not args.token:
-        print("Error: Jellyfin token is required. Set with --token or JELLYFIN_TOKEN environment variable.")
+        logger.error("Jellyfin token is required. Set with --token or JELLYFIN_TOKEN environment variable.")
         sys.exit(1)
     
-    fetcher = JellyfinDataFetcher(args.url, args.token, args.output, args.page_size, args.exclude_libraries)
-    fetcher.fetch_and_save_data()
+    fetcher = JellyfinDataFetcher(args.url, args.token, args.output, args.page_size, args.exclude_libraries,
+                                  preview_width=args.preview_width,
+                                  shared_artwork_index=args.shared_artwork_index or None,
+                                  shared_artwork_servers=args.shared_artwork_servers,
+                                  profile=args.profile, prioritized=args.prioritized,
+                                  priority_items=args.priority_items, lazy_images=args.lazy_images,
+                                  retry_delays=args.retry_delays, change_generations=args.change_generations,
+                                  columnar=args.columnar, library_intervals=args.library_intervals)
+    try:
+        fetcher.fetch_and_save_data()
+    finally:
+        fetcher.profiler.write_report()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -6,29 +6,76 @@ import os
 import sys
 from pathlib import Path
 import argparse
-from datetime import datetime
-import time
 import pwd
 import grp
 import hashlib
+import base64
 import pickle
+import logging
+from collections import Counter
+from catalog_publisher import CatalogPublisher, IMAGE_REFS_FILE, LAZY_IMAGE_MODES
+from catalog_changes import DEFAULT_CHANGE_GENERATIONS
+from columnar_catalog import publish_columnar_catalogs
+from sync_logging import setup_logging, format_duration, ProgressReporter
+from sync_profiler import SyncProfiler
+from sync_priority import DEFAULT_PRIORITY_ITEMS, split_catalog, carry_over_enrichment
+from search_index import SEARCH_INDEX_FILE, build_search_index
+from shared_artwork import SharedArtwork
+from catalog_merger import DEFAULT_MERGE_SERVERS
+from season_detail import fetch_plex_seasons, refresh_season_details
+from sync_recovery import (LIBRARY_STATE_FILE, DEFAULT_RETRY_DELAYS, IncompleteLibraryError, LibraryState,
+                           check_listing, parse_retry_delays)
+from sync_schedule import LibrarySchedule, parse_library_intervals
+
+logger = logging.getLogger("glimpse.plex")
+
+# Fields only the per-item detail request fills completely, refreshed last in a prioritized sync
+ENRICHED_FIELDS = ('actors', 'genres')
 
 class PlexDataFetcher:
-    def __init__(self, plex_url, plex_token, output_dir="data", page_size=100, excluded_libraries=None):
+    def __init__(self, plex_url, plex_token, output_dir="data", page_size=100, excluded_libraries=None, preview_width=20,
+                 shared_artwork_index=None, profile=False, prioritized=False, priority_items=DEFAULT_PRIORITY_ITEMS,
+                 lazy_images='off', retry_delays=None, change_generations=DEFAULT_CHANGE_GENERATIONS,
+                 columnar=False, library_intervals=None, shared_artwork_servers=None):
         self.plex_url = plex_url.rstrip('/')
         self.plex_token = plex_token
         self.output_dir = Path(output_dir)
         self.page_size = page_size  # Number of items per page
         self.excluded_libraries = set(excluded_libraries or [])
+        self.preview_width = preview_width  # Width of inline poster previews, 0 disables them
         self.checksums_file = self.output_dir / "checksums.pkl"
         self.checksums = self.load_checksums()
+        # Image outcomes of the library being processed, summarized once per library
+        self.image_stats = Counter()
+        # Artwork other servers already downloaded for the same titles (enabled with the merge's artwork index)
+        self.shared_artwork = None
+        if shared_artwork_index:
+            self.shared_artwork = SharedArtwork(self.output_dir, shared_artwork_servers or DEFAULT_MERGE_SERVERS,
+                                                shared_artwork_index, self.set_permissions)
+        # Image kinds left to the on-demand image proxy, which fetches them from image_refs.json
+        self.lazy_kinds = LAZY_IMAGE_MODES[lazy_images]
+        self.image_refs = {}
+        # Publish the catalog in milestones, newest posters first (see fetch_and_save_data_prioritized)
+        self.prioritized = prioritized
+        self.priority_items = priority_items
+        # Sections that fail keep their last complete data and are retried after these delays (seconds)
+        self.retry_delays = parse_retry_delays(DEFAULT_RETRY_DELAYS) if retry_delays is None else retry_delays
+        # Sections with a refresh interval are only synced once it has passed, others on every run
+        self.library_schedule = LibrarySchedule(library_intervals)
+        self.library_state = LibraryState(self.output_dir, self.image_refs, self.library_schedule)
+        # Number of catalog generations whose change files stay available to clients
+        self.change_generations = change_generations
+        # Also publish the catalogs column by column, which the UI prefers when listed in version.json
+        self.columnar = columnar
+        # Per-phase cProfile/tracemalloc recording, only active with --profile
+        self.profiler = SyncProfiler(self.output_dir, enabled=profile, set_permissions=self.set_permissions)
         
         # Get www-data UID and GID
         try:
             self.www_data_uid = pwd.getpwnam('www-data').pw_uid
             self.www_data_gid = grp.getgrnam('www-data').gr_gid
         except KeyError:
-            print("Warning: www-data user/group not found. File permissions will not be changed.")
+            logger.warning("www-data user/group not found. File permissions will not be changed.")
             self.www_data_uid = self.www_data_gid = None
         
         # Setup directories after initializing UID/GID
@@ -47,7 +94,7 @@ class PlexDataFetcher:
                 with open(self.checksums_file, 'rb') as f:
                     return pickle.load(f)
             except Exception as e:
-                print(f"Error loading checksums: {e}")
+                logger.error("Error loading checksums: %s", e)
         return {}
 
     def save_checksums(self):
@@ -57,7 +104,7 @@ class PlexDataFetcher:
                 pickle.dump(self.checksums, f)
             self.set_permissions(self.checksums_file)
         except Exception as e:
-            print(f"Error saving checksums: {e}")
+            logger.error("Error saving checksums: %s", e)
 
     def set_permissions(self, path):
         """Set permissions to www-data:www-data"""
@@ -65,9 +112,9 @@ class PlexDataFetcher:
             try:
                 os.chown(path, self.www_data_uid, self.www_data_gid)
             except PermissionError:
-                print(f"Warning: Insufficient permissions to change ownership of {path}. Run as root/sudo.")
+                logger.warning("Insufficient permissions to change ownership of %s. Run as root/sudo.", path)
             except Exception as e:
-                print(f"Error setting permissions for {path}: {e}")
+                logger.error("Error setting permissions for %s: %s", path, e)
 
     def setup_directories(self):
         """Create necessary directory structure"""
@@ -82,19 +129,6 @@ class PlexDataFetcher:
             directory.mkdir(parents=True, exist_ok=True)
             self.set_permissions(directory)
 
-    def clean_existing_data(self):
-        """Remove existing JSON files to ensure clean data"""
-        movies_file = self.output_dir / "movies.json"
-        tvshows_file = self.output_dir / "tvshows.json"
-        
-        for file_path in [movies_file, tvshows_file]:
-            if file_path.exists():
-                try:
-                    file_path.unlink()
-                    print(f"Removed existing file: {file_path}")
-                except Exception as e:
-                    print(f"Warning: Could not remove {file_path}: {e}")
-
     def is_library_excluded(self, library_name, library_id):
         """Check if a library should be excluded based on name or ID"""
         if not self.excluded_libraries:
@@ -111,7 +145,7 @@ class PlexDataFetcher:
             response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
-            print(f"Error fetching sections: {e}")
+            logger.error("Error fetching sections: %s", e)
             return None
 
     def fetch_detailed_metadata(self, rating_key):
@@ -125,26 +159,37 @@ class PlexDataFetcher:
                 return data['MediaContainer']['Metadata'][0]
             return None
         except requests.RequestException as e:
-            print(f"Error fetching detailed metadata for {rating_key}: {e}")
+            logger.error("Error fetching detailed metadata for %s: %s", rating_key, e)
             return None
 
     def fetch_section_content(self, section_key):
-        """Fetch all content from a specific section using pagination"""
+        """Fetch all content from a specific section using pagination.
+
+        Raises IncompleteLibraryError if a page fails or fewer items than the reported totalSize were listed.
+        """
         all_items = []
         offset = 0
+        total = None
         
         while True:
             try:
                 # Fetch items with pagination
                 response = self.session.get(
                     f"{self.plex_url}/library/sections/{section_key}/all",
-                    params={"X-Plex-Container-Start": offset, "X-Plex-Container-Size": self.page_size}
+                    params={
+                        "X-Plex-Container-Start": offset,
+                        "X-Plex-Container-Size": self.page_size,
+                        "includeGuids": 1
+                    }
                 )
                 response.raise_for_status()
                 data = response.json()
                 
                 if 'MediaContainer' not in data:
-                    break
+                    raise IncompleteLibraryError(f"Unexpected response at offset {offset}", all_items)
+                
+                if offset == 0:
+                    total = data['MediaContainer'].get('totalSize')
                     
                 items = data['MediaContainer'].get('Metadata', [])
                 items_count = len(items)
@@ -154,7 +199,7 @@ class PlexDataFetcher:
                     
                 all_items.extend(items)
                 
-                print(f"  Fetched {items_count} items (offset: {offset})")
+                logger.debug("Fetched %d items (offset: %d)", items_count, offset)
                 
                 # If we got fewer items than requested, we've reached the end
                 if items_count < self.page_size:
@@ -164,11 +209,12 @@ class PlexDataFetcher:
                 offset += self.page_size
                 
                 # Small delay to reduce server stress
-                time.sleep(0.5)
+                self.profiler.pause(0.5)
                 
             except requests.RequestException as e:
-                print(f"Error fetching section content (offset: {offset}): {e}")
-                break
+                raise IncompleteLibraryError(f"Error fetching section content (offset: {offset}): {e}", all_items) from e
+        
+        check_listing(all_items, total, f"Section {section_key}")
         
         # Return in the same format as the original function
         return {'MediaContainer': {'Metadata': all_items}} if all_items else None
@@ -185,7 +231,7 @@ class PlexDataFetcher:
             
             return md5_hash.hexdigest()
         except requests.RequestException as e:
-            print(f"Error calculating MD5 for {image_url}: {e}")
+            logger.error("Error calculating MD5 for %s: %s", image_url, e)
             return None
 
     def download_image(self, image_url, output_path):
@@ -200,6 +246,7 @@ class PlexDataFetcher:
             # Calculate new MD5 checksum
             new_md5 = self.calculate_remote_md5(image_url)
             if not new_md5:
+                self.image_stats['failed'] += 1
                 return False
             
             # Check if file exists and compare checksums
@@ -209,17 +256,23 @@ class PlexDataFetcher:
                 
                 # If checksums match, file hasn't changed
                 if old_md5 and old_md5 == new_md5:
-                    print(f"Image unchanged, skipping: {output_path.name}")
+                    logger.debug("Image unchanged, skipping: %s", output_path.name)
+                    self.image_stats['unchanged'] += 1
                     return True
                 else:
-                    print(f"Image changed, downloading: {output_path.name}")
+                    logger.debug("Image changed, downloading: %s", output_path.name)
+                    self.image_stats['changed'] += 1
             else:
-                print(f"New image, downloading: {output_path.name}")
+                logger.debug("New image, downloading: %s", output_path.name)
+                self.image_stats['new'] += 1
             
             # Download the image
             response = self.session.get(f"{self.plex_url}{image_url}")
             response.raise_for_status()
             
+            # Replace rather than overwrite, the file may be hard linked from another catalog
+            if output_path.exists():
+                output_path.unlink()
             with open(output_path, 'wb') as f:
                 f.write(response.content)
             
@@ -231,16 +284,87 @@ class PlexDataFetcher:
             
             return True
         except requests.RequestException as e:
-            print(f"Error downloading image {image_url}: {e}")
+            logger.error("Error downloading image %s: %s", image_url, e)
+            self.image_stats['failed'] += 1
             return False
 
-    def process_media_item(self, item, media_type):
+    def link_shared_artwork(self, media_info, media_type, kind, image_url, output_path, version):
+        """Hard link artwork another server already downloaded for a title this server has no own artwork for.
+
+        version changes with the server's own image, which then replaces the link.
+        """
+        if not self.shared_artwork:
+            return False
+        
+        checksum_key = f"{image_url}|{output_path}"
+        previous_state = self.checksums.get(checksum_key)
+        state = self.shared_artwork.link(media_info, media_type, kind, output_path, previous_state, version)
+        if state is None:
+            return False
+        
+        # Record the shared file so previews and later downloads see it as a known image
+        self.checksums[checksum_key] = state
+        self.image_stats['unchanged' if state == previous_state else 'shared'] += 1
+        return True
+
+    def record_image_ref(self, image_url, output_path, ref):
+        """Record an image for the on-demand image proxy instead of downloading it"""
+        self.image_refs[output_path.relative_to(self.output_dir).as_posix()] = ref
+        
+        # The reference changes with the image, so it doubles as change detection state for previews
+        checksum_key = f"{image_url}|{output_path}"
+        if self.checksums.get(checksum_key) != f"ref:{ref}":
+            # Drop an earlier download so nginx falls through to the proxy
+            if output_path.exists():
+                output_path.unlink()
+            self.checksums[checksum_key] = f"ref:{ref}"
+        self.image_stats['lazy'] += 1
+        return True
+
+    def fetch_image_preview(self, image_url, output_path):
+        """Fetch a tiny rendition of an image as a base64 data URI for inline placeholders"""
+        if not image_url or not self.preview_width:
+            return None
+        
+        # Previews share the change detection state of the full image they belong to
+        image_md5 = self.checksums.get(f"{image_url}|{output_path}")
+        preview_key = f"preview|{output_path}"
+        cached_preview = self.checksums.get(preview_key)
+        if image_md5 and cached_preview and cached_preview.get('md5') == image_md5:
+            return cached_preview['data']
+        
+        try:
+            # Let Plex's photo transcoder scale the poster down to a few pixels
+            response = self.session.get(
+                f"{self.plex_url}/photo/:/transcode",
+                params={
+                    "url": image_url,
+                    "width": self.preview_width,
+                    "height": self.preview_width * 3 // 2,
+                    "minSize": 1,
+                    "upscale": 0
+                }
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.error("Error fetching preview for %s: %s", image_url, e)
+            return None
+        
+        content_type = response.headers.get('Content-Type', 'image/jpeg').split(';')[0]
+        preview = f"data:{content_type};base64,{base64.b64encode(response.content).decode('ascii')}"
+        
+        if image_md5:
+            self.checksums[preview_key] = {'md5': image_md5, 'data': preview}
+        
+        return preview
+
+    def process_media_item(self, item, media_type, enrich=True):
         """Process a single media item and extract relevant metadata"""
         try:
             rating_key = item.get('ratingKey', '')
             
-            # Fetch detailed metadata to get cast with roles
-            detailed_item = self.fetch_detailed_metadata(rating_key)
+            # Fetch detailed metadata to get cast with roles (skipped for listing-only records)
+            detailed_item = self.fetch_detailed_metadata(rating_key) if enrich else None
             if detailed_item:
                 # Use detailed metadata if available, otherwise fall back to basic item
                 item = detailed_item
@@ -256,9 +380,16 @@ class PlexDataFetcher:
                 'addedAt': item.get('addedAt', ''),
                 'updatedAt': item.get('updatedAt', ''),
                 'genres': [],
-                'actors': []
+                'actors': [],
+                'providerIds': {}
             }
             
+            # Extract external provider IDs (imdb://, tmdb://, tvdb://) used to match titles across servers
+            for guid in item.get('Guid', []):
+                provider, _, external_id = guid.get('id', '').partition('://')
+                if provider and external_id:
+                    media_info['providerIds'][provider.lower()] = external_id
+            
             # Extract genre information
             if 'Genre' in item:
                 for genre in item['Genre']:
@@ -270,7 +401,6 @@ class PlexDataFetcher:
             
             # First try 'Role' field (most common)
             if 'Role' in item and not actors_found:
-                print(f"  Found Role field with {len(item['Role'])} actors")
                 for role in item['Role']:
                     actor_info = {
                         'name': role.get('tag', ''),
@@ -281,7 +411,6 @@ class PlexDataFetcher:
             
             # If 'Role' doesn't exist or is empty, try 'Actor' field
             if 'Actor' in item and not actors_found:
-                print(f"  Found Actor field with {len(item['Actor'])} actors")
                 for actor in item['Actor']:
                     actor_info = {
                         'name': actor.get('tag', ''),
@@ -292,7 +421,6 @@ class PlexDataFetcher:
             
             # Try 'Cast' field as a fallback
             if 'Cast' in item and not actors_found:
-                print(f"  Found Cast field with {len(item['Cast'])} actors")
                 for cast in item['Cast']:
                     actor_info = {
                         'name': cast.get('tag', ''),
@@ -302,8 +430,8 @@ class PlexDataFetcher:
                 actors_found = True
             
             # If we still don't have actors, try to get them from a different API endpoint
-            if not actors_found and rating_key:
-                print(f"  No actors found in standard fields, trying alternative approach...")
+            if not actors_found and rating_key and enrich:
+                logger.debug("No actors found in standard fields for %s, trying cast endpoint", rating_key)
                 try:
                     # Try fetching cast information separately
                     cast_response = self.session.get(f"{self.plex_url}/library/metadata/{rating_key}/cast")
@@ -317,18 +445,14 @@ class PlexDataFetcher:
                                 }
                                 media_info['actors'].append(actor_info)
                             actors_found = True
-                            print(f"  Found {len(media_info['actors'])} actors from cast endpoint")
+                            logger.debug("Found %d actors from cast endpoint", len(media_info['actors']))
                 except Exception as e:
-                    print(f"  Error fetching cast from alternative endpoint: {e}")
+                    logger.error("Error fetching cast from alternative endpoint for %s: %s", rating_key, e)
             
             # Limit to first 3 actors to match Jellyfin behavior
             if len(media_info['actors']) > 3:
                 media_info['actors'] = media_info['actors'][:3]
             
-            print(f"  Final cast count: {len(media_info['actors'])}")
-            for i, actor in enumerate(media_info['actors']):
-                print(f"    {i+1}. {actor['name']} as '{actor['role']}'")
-            
             if media_type == 'movie':
                 media_info.update({
                     'duration': item.get('duration', ''),
@@ -346,116 +470,274 @@ class PlexDataFetcher:
             
             return media_info
         except Exception as e:
-            print(f"Error processing media item: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error processing media item %s: %s", item.get('title', 'Unknown'), e)
             return None
 
-    def fetch_and_save_data(self):
-        """Main method to fetch all data and save it"""
-        print(f"Starting Plex data fetch at {datetime.now()}")
-        
-        if self.excluded_libraries:
-            print(f"Excluded libraries: {', '.join(self.excluded_libraries)}")
-        
-        # Clean existing data files
-        self.clean_existing_data()
+    def process_poster(self, item, media_info, media_type):
+        """Download or link an item's poster and attach its inline preview"""
+        poster_url = item.get('thumb')
+        if not poster_url:
+            return
         
-        # Get all sections
-        sections_data = self.fetch_sections()
-        if not sections_data or 'MediaContainer' not in sections_data:
-            print("Failed to fetch sections")
+        poster_path = self.output_dir / "posters" / f"{media_type}s" / f"{media_info['id']}.jpg"
+        if 'poster' in self.lazy_kinds:
+            success = self.record_image_ref(poster_url, poster_path, poster_url)
+        else:
+            success = (self.link_shared_artwork(media_info, media_type, 'poster', poster_url, poster_path,
+                                                poster_url) or
+                       self.download_image(poster_url, poster_path))
+        if success:
+            preview = self.fetch_image_preview(poster_url, poster_path)
+            if preview:
+                media_info['posterPreview'] = preview
+        else:
+            logger.warning("Failed to process poster for: %s", media_info['title'])
+
+    def process_backdrop(self, item, media_info, media_type):
+        """Download or link an item's backdrop/art image if available"""
+        backdrop_url = item.get('art')
+        if not backdrop_url:
             return
         
-        sections = sections_data['MediaContainer'].get('Directory', [])
+        backdrop_path = self.output_dir / "backdrops" / f"{media_type}s" / f"{media_info['id']}.jpg"
+        if 'backdrop' in self.lazy_kinds:
+            success = self.record_image_ref(backdrop_url, backdrop_path, backdrop_url)
+        else:
+            success = (self.link_shared_artwork(media_info, media_type, 'backdrop', backdrop_url, backdrop_path,
+                                                backdrop_url) or
+                       self.download_image(backdrop_url, backdrop_path))
+        if not success:
+            logger.warning("Failed to process backdrop for: %s", media_info['title'])
+
+    def publish_catalog(self, movies_data, tvshows_data):
+        """Save both catalogs and the version manifest, returning the manifest"""
+        with self.profiler.phase('publish'):
+            # Save JSON files as compact JSON with precompressed .gz/.br sidecars
+            publisher = CatalogPublisher(self.output_dir, self.set_permissions, self.change_generations)
+            movies_file = self.output_dir / "movies.json"
+            tvshows_file = self.output_dir / "tvshows.json"
+            
+            logger.info("Saving %d movies to: %s", len(movies_data), movies_file)
+            movies_result = publisher.publish_json(movies_file.name, movies_data, versioned=True)
+            
+            logger.info("Saving %d TV shows to: %s", len(tvshows_data), tvshows_file)
+            tvshows_result = publisher.publish_json(tvshows_file.name, tvshows_data, versioned=True)
+            
+            # Search index over titles, cast and studios, versioned together with the catalogs it points into
+            search_index = build_search_index(movies_data, tvshows_data)
+            search_result = publisher.publish_json(SEARCH_INDEX_FILE, search_index, versioned=True)
+            
+            # Columnar copies of both catalogs, smaller to download and parse for very large libraries
+            catalogs = {movies_file.name: movies_data, tvshows_file.name: tvshows_data}
+            columnar_results = publish_columnar_catalogs(publisher, catalogs, self.columnar)
+            
+            # Publish the version manifest the service worker checks before using cached catalogs
+            manifest = publisher.publish_manifest([movies_result, tvshows_result, search_result] + columnar_results,
+                                                  catalogs)
+            logger.info("Published data version: %s", manifest['version'])
+            
+            # Image references the on-demand image proxy resolves lazily loaded images with
+            if self.lazy_kinds:
+                publisher.publish_json(IMAGE_REFS_FILE, self.image_refs)
+            else:
+                for suffix in ('', '.gz', '.br'):
+                    (self.output_dir / f"{IMAGE_REFS_FILE}{suffix}").unlink(missing_ok=True)
+            
+            # Sections of this catalog whose listing was complete, the fallback of the next run
+            publisher.publish_json(LIBRARY_STATE_FILE, self.library_state.libraries)
+            
+            # Save checksums
+            self.save_checksums()
         
-        movies_data = []
-        tvshows_data = []
+        return manifest
+
+    def list_sections(self):
+        """Return the sections to sync as (title, media type, key), or None if they could not be fetched"""
+        with self.profiler.phase('listing'):
+            sections_data = self.fetch_sections()
+        if not sections_data or 'MediaContainer' not in sections_data:
+            logger.error("Failed to fetch sections")
+            return None
         
-        for section in sections:
+        sections = []
+        for section in sections_data['MediaContainer'].get('Directory', []):
             section_key = section.get('key')
             section_type = section.get('type')
             section_title = section.get('title')
             
-            print(f"\nProcessing section: {section_title} (Type: {section_type})")
-            
             # Check if this library should be excluded
             if self.is_library_excluded(section_title, section_key):
-                print(f"Skipping excluded library: {section_title}")
+                logger.info("Skipping excluded library: %s", section_title)
                 continue
             
             if section_type not in ['movie', 'show']:
-                print(f"Skipping unsupported section type: {section_type}")
+                logger.debug("Skipping unsupported section: %s (Type: %s)", section_title, section_type)
                 continue
             
-            # Fetch content for this section
+            sections.append((section_title, 'movie' if section_type == 'movie' else 'tvshow', section_key))
+        
+        return sections
+
+    def list_section_items(self, section):
+        """List the items of a (title, media type, key) section, raising IncompleteLibraryError on failure"""
+        section_title, media_type, section_key = section
+        logger.info("Processing section: %s (Type: %s)", section_title, media_type)
+        
+        with self.profiler.phase('listing'):
             content_data = self.fetch_section_content(section_key)
-            if not content_data or 'MediaContainer' not in content_data:
-                continue
-            
-            items = content_data['MediaContainer'].get('Metadata', [])
-            print(f"Found {len(items)} items in {section_title}")
-            
+        items = content_data['MediaContainer'].get('Metadata', []) if content_data else []
+        logger.info("Found %d items in %s", len(items), section_title)
+        return items
+
+    def process_section_items(self, section_title, media_type, items):
+        """Fully process the listed items of a section, returning their (item, media type, media info) entries"""
+        entries = []
+        self.image_stats = Counter()
+        failed_items = 0
+        progress = ProgressReporter(logger, f"Section '{section_title}'", len(items))
+        
+        with self.profiler.phase('items'):
             for i, item in enumerate(items):
-                print(f"Processing item {i+1}/{len(items)}: {item.get('title', 'Unknown')}")
-                media_type = 'movie' if section_type == 'movie' else 'tvshow'
-                media_info = self.process_media_item(item, media_type)
+                logger.debug("Processing item %d/%d: %s", i + 1, len(items), item.get('title', 'Unknown'))
+                with self.profiler.phase('details'):
+                    media_info = self.process_media_item(item, media_type)
                 
                 if media_info:
-                    # Determine output paths
-                    poster_dir = self.output_dir / "posters" / f"{media_type}s"
-                    poster_path = poster_dir / f"{media_info['id']}.jpg"
-                    
-                    # Download poster
-                    poster_url = item.get('thumb')
-                    if poster_url:
-                        success = self.download_image(poster_url, poster_path)
-                        if success:
-                            print(f"  ✓ Processed poster for: {media_info['title']}")
-                        else:
-                            print(f"  ✗ Failed to process poster for: {media_info['title']}")
-                    
-                    # Download backdrop/art image if available
-                    backdrop_url = item.get('art')
-                    if backdrop_url:
-                        backdrop_dir = self.output_dir / "backdrops" / f"{media_type}s"
-                        backdrop_path = backdrop_dir / f"{media_info['id']}.jpg"
-                        success = self.download_image(backdrop_url, backdrop_path)
-                        if success:
-                            print(f"  ✓ Processed backdrop for: {media_info['title']}")
-                        else:
-                            print(f"  ✗ Failed to process backdrop for: {media_info['title']}")
-                    
-                    # Add to appropriate list
-                    if media_type == 'movie':
-                        movies_data.append(media_info)
-                    else:
-                        tvshows_data.append(media_info)
+                    with self.profiler.phase('image_hash'):
+                        self.process_poster(item, media_info, media_type)
+                        self.process_backdrop(item, media_info, media_type)
+                    entries.append((item, media_type, media_info))
+                else:
+                    failed_items += 1
+                
+                progress.update()
                 
                 # Add a small delay between items to reduce server load
-                time.sleep(0.1)
+                self.profiler.pause(0.1)
         
-        # Save JSON files
-        movies_file = self.output_dir / "movies.json"
-        tvshows_file = self.output_dir / "tvshows.json"
+        progress.finish(failed_items=failed_items, **self.image_stats)
+        return entries
+
+    def list_section_records(self, section_title, media_type, items):
+        """Build listing-only entries for the items of a section, without any further requests"""
+        entries = []
+        for item in items:
+            media_info = self.process_media_item(item, media_type, enrich=False)
+            if media_info:
+                entries.append((item, media_type, media_info))
+        return entries
+
+    def refresh_seasons(self):
+        """Rebuild the season detail of shows someone opened whose updatedAt or episode count changed"""
+        tvshows_data = split_catalog(self.library_state.all_entries())[1]
+        with self.profiler.phase('seasons'):
+            stats = refresh_season_details(self.output_dir, tvshows_data,
+                                           lambda show_id: fetch_plex_seasons(self.session, self.plex_url, show_id),
+                                           self.set_permissions)
+        if stats:
+            logger.info("Season detail of opened shows: %s", ', '.join(f"{count} {outcome}" for outcome, count in stats.items()))
+
+    def publish_library_entries(self):
+        """Publish the catalog of all sections, synced or standing in from the last complete sync"""
+        return self.publish_catalog(*split_catalog(self.library_state.all_entries()))
+
+    def retry_failed_sections(self, failed_sections):
+        """Retry sections whose listing failed, republishing the catalog whenever one recovers"""
+        self.library_state.retry(failed_sections, self.retry_delays, self.list_section_items,
+                                 self.process_section_items, self.publish_library_entries)
+
+    def fetch_and_save_data(self):
+        """Main method to fetch all data and save it"""
+        logger.info("Starting Plex data fetch from %s", self.plex_url)
+        
+        if self.excluded_libraries:
+            logger.info("Excluded libraries: %s", ', '.join(self.excluded_libraries))
         
-        print(f"\nSaving {len(movies_data)} movies to: {movies_file}")
-        with open(movies_file, 'w') as f:
-            json.dump(movies_data, f, indent=2)
-        self.set_permissions(movies_file)
+        if self.library_schedule:
+            logger.info("Library refresh intervals: %s", ', '.join(
+                f"{library} every {format_duration(interval)}" for library, interval in self.library_schedule.intervals.items()))
+        
+        sections = self.list_sections()
+        if sections is None:
+            return
+        
+        if self.prioritized:
+            return self.fetch_and_save_data_prioritized(sections)
+        
+        # Each section is listed and processed on its own; failed ones keep their last complete data
+        failed_sections = self.library_state.sync(sections, self.list_section_items, self.process_section_items)
+        self.publish_library_entries()
+        self.retry_failed_sections(failed_sections)
+        self.refresh_seasons()
+        
+        movies_data, tvshows_data = split_catalog(self.library_state.all_entries())
+        logger.info("Data fetch completed: %d movies, %d TV shows saved to %s",
+                    len(movies_data), len(tvshows_data), self.output_dir)
+
+    def fetch_and_save_data_prioritized(self, sections):
+        """Sync in order of what the grid needs first, publishing the catalog at each milestone.
+
+        1. Listing-only records for every item, plus posters of the newest items
+        2. Posters of all remaining items, newest first
+        3. Backdrops and detail enrichment (full cast and genres)
+
+        Sections that fail keep their last complete data through all milestones and are retried at the end.
+        """
+        failed_sections = self.library_state.sync(sections, self.list_section_items, self.list_section_records)
+        
+        # Records standing in for failed sections are complete already, only listed items need work
+        entries = [entry for entry in self.library_state.all_entries() if entry[0] is not None]
+        
+        # Artwork goes newest first; the catalog itself keeps the listing order
+        by_newest = sorted(entries, key=lambda entry: int(entry[2].get('addedAt') or 0), reverse=True)
+        
+        # Keep last run's enrichment visible until this run refreshes it
+        carry_over_enrichment([media_info for _, _, media_info in entries], self.output_dir, ENRICHED_FIELDS)
+        
+        stages = [
+            ("Newest posters", by_newest[:self.priority_items]),
+            ("Remaining posters", by_newest[self.priority_items:])
+        ]
+        for label, stage_entries in stages:
+            self.image_stats = Counter()
+            progress = ProgressReporter(logger, label, len(stage_entries))
+            with self.profiler.phase('posters'):
+                for item, media_type, media_info in stage_entries:
+                    self.process_poster(item, media_info, media_type)
+                    progress.update()
+            progress.finish(**self.image_stats)
+            manifest = self.publish_library_entries()
+            logger.info("Milestone '%s' published (version %s)", label, manifest['version'])
+        
+        self.image_stats = Counter()
+        failed_items = 0
+        progress = ProgressReporter(logger, "Backdrops and details", len(entries))
+        with self.profiler.phase('enrichment'):
+            for item, media_type, media_info in entries:
+                with self.profiler.phase('details'):
+                    detailed_info = self.process_media_item(item, media_type)
+                if detailed_info:
+                    media_info.update(detailed_info)
+                else:
+                    failed_items += 1
+                with self.profiler.phase('image_hash'):
+                    self.process_backdrop(item, media_info, media_type)
+                progress.update()
+                
+                # Add a small delay between items to reduce server load
+                self.profiler.pause(0.1)
+        progress.finish(failed_items=failed_items, **self.image_stats)
         
-        print(f"Saving {len(tvshows_data)} TV shows to: {tvshows_file}")
-        with open(tvshows_file, 'w') as f:
-            json.dump(tvshows_data, f, indent=2)
-        self.set_permissions(tvshows_file)
+        manifest = self.publish_library_entries()
+        logger.info("Milestone 'Backdrops and details' published (version %s)", manifest['version'])
         
-        # Save checksums
-        self.save_checksums()
+        # Sections recovering on a retry are processed in full, there are no milestones left to spread them over
+        self.retry_failed_sections(failed_sections)
+        self.refresh_seasons()
         
-        print(f"\nData fetch completed at {datetime.now()}")
-        print(f"Movies: {len(movies_data)}")
-        print(f"TV Shows: {len(tvshows_data)}")
-        print(f"Data saved to: {self.output_dir}")
+        movies_data, tvshows_data = split_catalog(self.library_state.all_entries())
+        logger.info("Data fetch completed: %d movies, %d TV shows saved to %s",
+                    len(movies_data), len(tvshows_data), self.output_dir)
 
 def main():
     # Get values from environment variables first
@@ -463,10 +745,21 @@ def main():
     default_token = os.environ.get('PLEX_TOKEN', '')
     default_output = os.environ.get('OUTPUT_DIR', 'data')
     default_page_size = int(os.environ.get('PAGE_SIZE', '100'))
+    default_preview_width = int(os.environ.get('PREVIEW_WIDTH', '20'))
+    default_shared_artwork_index = os.environ.get('SHARED_ARTWORK_INDEX', '')
+    default_shared_artwork_servers = os.environ.get('MERGE_SERVERS', ','.join(DEFAULT_MERGE_SERVERS))
+    default_log_level = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    default_lazy_images = os.environ.get('LAZY_IMAGES', 'off').lower()
+    default_prioritized = os.environ.get('PRIORITIZED_SYNC', 'false').lower() == 'true'
+    default_priority_items = int(os.environ.get('PRIORITY_ITEMS', str(DEFAULT_PRIORITY_ITEMS)))
+    default_retry_delays = os.environ.get('LIBRARY_RETRY_DELAYS', DEFAULT_RETRY_DELAYS)
+    default_change_generations = int(os.environ.get('CHANGE_GENERATIONS', str(DEFAULT_CHANGE_GENERATIONS)))
+    default_columnar = os.environ.get('COLUMNAR_CATALOG', 'false').lower() == 'true'
     
     # Get excluded libraries from environment variable
     excluded_libraries_str = os.environ.get('PLEX_EXCLUDE_LIBRARIES', '')
     excluded_libraries = [lib.strip() for lib in excluded_libraries_str.split(',') if lib.strip()] if excluded_libraries_str else []
+    default_library_intervals = os.environ.get('PLEX_LIBRARY_INTERVALS', '')
     
     parser = argparse.ArgumentParser(description='Fetch Plex media data and posters')
     
@@ -475,8 +768,35 @@ def main():
     parser.add_argument('--token', default=default_token, help='Plex authentication token')
     parser.add_argument('--output', default=default_output, help='Output directory (default: data)')
     parser.add_argument('--page-size', type=int, default=default_page_size, help='Number of items per page (default: 100)')
+    parser.add_argument('--preview-width', type=int, default=default_preview_width,
+                        help='Width in pixels of inline poster previews, 0 to disable (default: 20)')
+    parser.add_argument('--shared-artwork-index', default=default_shared_artwork_index,
+                        help='Artwork index written by catalog_merger.py, reuses artwork other servers already downloaded')
+    parser.add_argument('--shared-artwork-servers', default=default_shared_artwork_servers,
+                        type=lambda value: [server.strip() for server in value.split(',') if server.strip()],
+                        help='Servers to reuse artwork from, preferred first (default: plex,jellyfin,emby)')
+    parser.add_argument('--log-level', default=default_log_level, choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='Logging level, DEBUG adds per-item detail (default: INFO)')
+    parser.add_argument('--verbose', action='store_true', help='Shortcut for --log-level DEBUG')
+    parser.add_argument('--profile', action='store_true',
+                        help='Record cProfile and tracemalloc data per sync phase into <output>/profile')
+    parser.add_argument('--lazy-images', default=default_lazy_images, choices=list(LAZY_IMAGE_MODES),
+                        help='Leave backdrops or all images to the on-demand image proxy instead of downloading them (default: off)')
+    parser.add_argument('--prioritized', action='store_true', default=default_prioritized,
+                        help='Publish newest posters first, then remaining posters, then backdrops and details')
+    parser.add_argument('--priority-items', type=int, default=default_priority_items,
+                        help=f'Newest items whose posters come with the first publish (default: {DEFAULT_PRIORITY_ITEMS})')
+    parser.add_argument('--retry-delays', type=parse_retry_delays, default=default_retry_delays,
+                        help=f'Seconds to wait before each retry of libraries that failed, "off" for none (default: {DEFAULT_RETRY_DELAYS})')
+    parser.add_argument('--change-generations', type=int, default=default_change_generations,
+                        help=f'Catalog generations to keep change files for, 0 disables them (default: {DEFAULT_CHANGE_GENERATIONS})')
+    parser.add_argument('--columnar', action='store_true', default=default_columnar,
+                        help='Also publish columnar copies of the catalogs (movies.columns.json) for very large libraries')
     parser.add_argument('--exclude-libraries', nargs='*', default=excluded_libraries, 
                         help='Libraries to exclude (library names or IDs, space-separated)')
+    parser.add_argument('--library-intervals', type=parse_library_intervals, default=default_library_intervals,
+                        help='Refresh intervals of individual libraries as comma-separated <name or ID>=<interval> '
+                             'pairs, e.g. "New Releases=1h,Archive=7d"; other libraries sync on every run')
     
     # Handle special case for tokens with leading hyphens
     # This allows using "=" syntax for the token (--token=-abc123)
@@ -486,17 +806,28 @@ def main():
             break
     
     args = parser.parse_args()
+    setup_logging('DEBUG' if args.verbose else args.log_level)
     
     # Validate required parameters
     if not args.url:
-        print("Error: Plex URL is required. Set with --url or PLEX_URL environment variable.")
+        logger.error("Plex URL is required. Set with --url or PLEX_URL environment variable.")
         sys.exit(1)
     if not args.token:
-        print("Error: Plex token is required. Set with --token or PLEX_TOKEN environment variable.")
+        logger.error("Plex token is required. Set with --token or PLEX_TOKEN environment variable.")
         sys.exit(1)
     
-    fetcher = PlexDataFetcher(args.url, args.token, args.output, args.page_size, args.exclude_libraries)
-    fetcher.fetch_and_save_data()
+    fetcher = PlexDataFetcher(args.url, args.token, args.output, args.page_size, args.exclude_libraries,
+                              preview_width=args.preview_width,
+                              shared_artwork_index=args.shared_artwork_index or None,
+                              shared_artwork_servers=args.shared_artwork_servers,
+                              profile=args.profile, prioritized=args.prioritized,
+                              priority_items=args.priority_items, lazy_images=args.lazy_images,
+                              retry_delays=args.retry_delays, change_generations=args.change_generations,
+                              columnar=args.columnar, library_intervals=args.library_intervals)
+    try:
+        fetcher.fetch_and_save_data()
+    finally:
+        fetcher.profiler.write_report()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
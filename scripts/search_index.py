@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+import re
+import unicodedata
+from collections import defaultdict
+
+# Bumped whenever the layout changes, so the UI can ignore indexes it does not understand
+SEARCH_INDEX_VERSION = 1
+
+SEARCH_INDEX_FILE = "search.json"
+
+# Letters and digits - the same token definition the UI uses for queries
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+
+def normalize_text(text):
+    """Lowercase text and fold accents (é -> e) the same way the UI does for queries"""
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    return ''.join(char for char in decomposed if not unicodedata.category(char).startswith('M')).lower()
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(normalize_text(text))
+
+def item_terms(item):
+    """Return the searchable terms of a catalog record: title, actor names and studio"""
+    terms = set(tokenize(item.get('title') or ''))
+    terms.update(tokenize(item.get('studio') or ''))
+    for actor in item.get('actors') or []:
+        terms.update(tokenize(actor.get('name') or ''))
+    return terms
+
+def delta_encode(values):
+    """Encode a sorted list of integers as the differences between neighbours"""
+    previous = 0
+    encoded = []
+    for value in values:
+        encoded.append(value - previous)
+        previous = value
+    return encoded
+
+def build_catalog_index(records):
+    """Build the inverted index of one catalog, referring to records by their position.
+
+    terms is sorted so prefixes are a binary search away, postings[i] lists the
+    records containing terms[i], and trigrams maps every three-character substring
+    to the terms containing it for infix matches. All lists are delta encoded.
+    """
+    postings = defaultdict(list)
+    for position, record in enumerate(records):
+        for term in item_terms(record):
+            postings[term].append(position)
+
+    terms = sorted(postings)
+    trigrams = defaultdict(list)
+    for term_id, term in enumerate(terms):
+        for gram in sorted({term[i:i + 3] for i in range(len(term) - 2)}):
+            trigrams[gram].append(term_id)
+
+    return {
+        'count': len(records),
+        'terms': terms,
+        'postings': [delta_encode(postings[term]) for term in terms],
+        'trigrams': {gram: delta_encode(term_ids) for gram, term_ids in sorted(trigrams.items())}
+    }
+
+def build_search_index(movies_data, tvshows_data):
+    """Build the search index published next to movies.json and tvshows.json"""
+    return {
+        'version': SEARCH_INDEX_VERSION,
+        'movies': build_catalog_index(movies_data),
+        'tvshows': build_catalog_index(tvshows_data)
+    }
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+
+import os
+import pwd
+import grp
+import json
+import shutil
+import logging
+from collections import Counter
+import requests
+from catalog_publisher import CatalogPublisher
+
+logger = logging.getLogger("glimpse.seasons")
+
+# Season and episode detail of a show lives in <output>/tvshows/<id>/seasons.json
+SEASONS_DIR = "tvshows"
+SEASONS_FILE = "seasons.json"
+
+def seasons_name(show_id):
+    """Return the path of a show's season detail, relative to the server's data directory"""
+    return f"{SEASONS_DIR}/{show_id}/{SEASONS_FILE}"
+
+def www_data_permissions():
+    """Return a set_permissions function handing files to www-data like the fetchers do, or None without that user"""
+    try:
+        uid = pwd.getpwnam('www-data').pw_uid
+        gid = grp.getgrnam('www-data').gr_gid
+    except KeyError:
+        logger.warning("www-data user/group not found. File permissions will not be changed.")
+        return None
+
+    def set_permissions(path):
+        try:
+            os.chown(path, uid, gid)
+        except PermissionError:
+            logger.warning("Insufficient permissions to change ownership of %s. Run as root/sudo.", path)
+        except Exception as e:
+            logger.error("Error setting permissions for %s: %s", path, e)
+    return set_permissions
+
+def is_current(document, show):
+    """Check if a season detail document still matches the show's catalog record"""
+    return (document.get('updatedAt') == show.get('updatedAt') and
+            document.get('leafCount') == show.get('leafCount'))
+
+def fetch_plex_seasons(session, base_url, show_id, timeout=None, user_id=None):
+    """Return the seasons of a Plex show with their episodes, using one request for each (Plex needs no user)"""
+    response = session.get(f"{base_url}/library/metadata/{show_id}/children", timeout=timeout)
+    response.raise_for_status()
+    seasons = [{
+        'id': str(season.get('ratingKey', '')),
+        'index': season.get('index', ''),
+        'title': season.get('title', ''),
+        'episodes': []
+    } for season in response.json().get('MediaContainer', {}).get('Metadata', [])]
+
+    # allLeaves lists the episodes of all seasons at once instead of one request per season
+    response = session.get(f"{base_url}/library/metadata/{show_id}/allLeaves", timeout=timeout)
+    response.raise_for_status()
+    by_key = {season['id']: season for season in seasons}
+    by_index = {season['index']: season for season in seasons}
+    for episode in response.json().get('MediaContainer', {}).get('Metadata', []):
+        season = by_key.get(str(episode.get('parentRatingKey', ''))) or by_index.get(episode.get('parentIndex'))
+        if not season:
+            continue
+        season['episodes'].append({
+            'id': str(episode.get('ratingKey', '')),
+            'index': episode.get('index', ''),
+            'title': episode.get('title', ''),
+            'summary': episode.get('summary', ''),
+            'duration': episode.get('duration', ''),
+            'originallyAvailableAt': episode.get('originallyAvailableAt', '')
+        })
+    return seasons
+
+def fetch_jellyfin_user_id(session, base_url, timeout=None):
+    """Return the ID of the first Jellyfin/Emby user, whose view the fetchers list, or None"""
+    response = session.get(f"{base_url}/Users", timeout=timeout)
+    response.raise_for_status()
+    users = response.json()
+    return users[0]['Id'] if users else None
+
+def fetch_jellyfin_seasons(session, base_url, show_id, timeout=None, user_id=None):
+    """Return the seasons of a Jellyfin/Emby series with their episodes, using one request for each.
+
+    Emby and older Jellyfin versions need the user for these endpoints.
+    """
+    response = session.get(f"{base_url}/Shows/{show_id}/Seasons", params={"UserId": user_id}, timeout=timeout)
+    response.raise_for_status()
+    seasons = [{
+        'id': str(season.get('Id', '')),
+        'index': season.get('IndexNumber', ''),
+        'title': season.get('Name', ''),
+        'episodes': []
+    } for season in response.json().get('Items', [])]
+
+    response = session.get(
+        f"{base_url}/Shows/{show_id}/Episodes",
+        params={"UserId": user_id, "Fields": "Overview", "EnableImages": "false", "EnableUserData": "false"},
+        timeout=timeout
+    )
+    response.raise_for_status()
+    by_key = {season['id']: season for season in seasons}
+    by_index = {season['index']: season for season in seasons}
+    for episode in response.json().get('Items', []):
+        season = by_key.get(str(episode.get('SeasonId', ''))) or by_index.get(episode.get('ParentIndexNumber'))
+        if not season:
+            continue
+        season['episodes'].append({
+            'id': str(episode.get('Id', '')),
+            'index': episode.get('IndexNumber', ''),
+            'title': episode.get('Name', ''),
+            'summary': episode.get('Overview', ''),
+            # Jellyfin uses ticks (100 nanoseconds), convert to milliseconds like Plex
+            'duration': episode['RunTimeTicks'] // 10000 if episode.get('RunTimeTicks') else '',
+            'originallyAvailableAt': episode.get('PremiereDate', '')
+        })
+    return seasons
+
+# Season fetchers by server type, all called as fetch(session, base_url, show_id, timeout, user_id)
+SEASON_FETCHERS = {
+    'plex': fetch_plex_seasons,
+    'jellyfin': fetch_jellyfin_seasons,
+    'emby': fetch_jellyfin_seasons
+}
+
+# Servers whose season requests need a user ID, resolved once as fetch(session, base_url, timeout)
+USER_ID_FETCHERS = {
+    'jellyfin': fetch_jellyfin_user_id,
+    'emby': fetch_jellyfin_user_id
+}
+
+def publish_seasons(output_dir, show, seasons, set_permissions=None):
+    """Write the season detail document of a show, stamped with the record it was built for"""
+    document = {
+        'id': show['id'],
+        'updatedAt': show.get('updatedAt', ''),
+        'leafCount': show.get('leafCount', ''),
+        'seasons': seasons
+    }
+    name = seasons_name(show['id'])
+    show_dir = (output_dir / name).parent
+    show_dir.mkdir(parents=True, exist_ok=True)
+    if set_permissions:
+        set_permissions(show_dir.parent)
+        set_permissions(show_dir)
+    CatalogPublisher(output_dir, set_permissions).publish_json(name, document)
+    return document
+
+def season_sources(server, show):
+    """Return the (server, show ID) pairs a show's seasons can be fetched from, in order of preference.
+
+    Merged titles list the servers their record came from, other shows come from their own server.
+    """
+    return [(source['server'], source['id']) for source in show.get('sources', [])] or [(server, show['id'])]
+
+def generate_seasons(data_dir, server, show, fetchers, set_permissions=None):
+    """Write the season detail of a show nobody opened yet, on the first request for it.
+
+    The file lands in the data directory of the server the UI asked (merged
+    included), where nginx serves it from then on. fetchers maps the servers that
+    can be reached to fetch(show_id). Returns the document, or None when none of
+    the show's sources can be reached.
+    """
+    for source_server, source_id in season_sources(server, show):
+        if source_server in fetchers:
+            seasons = fetchers[source_server](source_id)
+            return publish_seasons(data_dir / server, show, seasons, set_permissions)
+    return None
+
+def refresh_season_details(output_dir, shows, fetch_seasons=None, set_permissions=None):
+    """Keep the season detail files that exist in line with the catalog.
+
+    Only shows somebody opened have a seasons.json (the on-demand service writes it
+    on first request). Those are rebuilt when the show's updatedAt or episode count
+    changed, and files of shows that left the catalog are removed, so a sync never
+    loads episodes for the whole library. Without fetch_seasons outdated files are
+    removed as well, to be generated again on the next request.
+    """
+    stats = Counter()
+    seasons_root = output_dir / SEASONS_DIR
+    if not seasons_root.is_dir():
+        return stats
+
+    shows_by_id = {show['id']: show for show in shows}
+    for show_dir in seasons_root.iterdir():
+        show = shows_by_id.get(show_dir.name)
+        if show is None:
+            shutil.rmtree(show_dir, ignore_errors=True)
+            stats['removed'] += 1
+            continue
+
+        try:
+            with open(show_dir / SEASONS_FILE, 'r') as f:
+                if is_current(json.load(f), show):
+                    stats['unchanged'] += 1
+                    continue
+        except (OSError, ValueError):
+            pass
+
+        if fetch_seasons is None:
+            shutil.rmtree(show_dir, ignore_errors=True)
+            stats['removed'] += 1
+            continue
+
+        try:
+            publish_seasons(output_dir, show, fetch_seasons(show['id']), set_permissions)
+            stats['refreshed'] += 1
+        except (requests.RequestException, ValueError, OSError) as e:
+            logger.error("Error refreshing seasons of %s: %s", show.get('title', show['id']), e)
+            stats['failed'] += 1
+
+    return stats
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import shutil
+import logging
+from pathlib import Path
+from catalog_merger import CATALOGS, CatalogMerger
+
+logger = logging.getLogger("glimpse.artwork")
+
+# Prefix of the change detection state recorded for linked artwork, instead of an MD5
+SHARED_STATE_PREFIX = "shared:"
+
+class SharedArtwork:
+    """Posters and backdrops other servers already downloaded, so each title's artwork is fetched once.
+
+    Sources are found by provider ID in the catalogs the other servers last
+    published, preferred in the order of servers (MERGE_SERVERS), with the merge's
+    artwork index as a fallback. Titles a server syncs for the first time are
+    linked to another server's file when there is one. Artwork a server
+    downloaded itself is never replaced by a link, and a linked file is replaced
+    by the server's own as soon as the server's image changes (custom artwork),
+    so a per-server catalog only shows another server's artwork for titles whose
+    own artwork the server never changed since they were linked.
+    """
+
+    def __init__(self, output_dir, servers, index_file=None, set_permissions=None):
+        self.output_dir = Path(output_dir)
+        self.set_permissions = set_permissions or (lambda path: None)
+        self.sources = {}  # match key -> {kind: path}, first preferred server first
+        data_dir = self.output_dir.parent
+        for server in servers:
+            if server == self.output_dir.name:
+                continue
+            for media_type, file_name in CATALOGS.items():
+                for item in self.load_json(data_dir / server / file_name) or []:
+                    artwork = {
+                        kind[:-1]: data_dir / server / kind / f"{media_type}s" / f"{item.get('id', '')}.jpg"
+                        for kind in ('posters', 'backdrops')
+                    }
+                    for key in CatalogMerger.match_keys(item, media_type):
+                        self.sources.setdefault(key, artwork)
+        if index_file:
+            for key, artwork in (self.load_json(Path(index_file)) or {}).items():
+                self.sources.setdefault(key, {kind: Path(path) for kind, path in artwork.items()})
+
+    @staticmethod
+    def load_json(path):
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error("Error loading %s: %s", path, e)
+            return None
+
+    def find(self, media_info, media_type, kind, output_path):
+        """Return another server's existing artwork file for a title, or None"""
+        for key in CatalogMerger.match_keys(media_info, media_type):
+            source_path = self.sources.get(key, {}).get(kind)
+            if source_path and source_path.exists() and source_path.resolve() != output_path.resolve():
+                return source_path
+        return None
+
+    def link(self, media_info, media_type, kind, output_path, state, version):
+        """Link another server's artwork for a title, returning the new change detection state.
+
+        state is what the fetcher recorded for output_path so far, version changes
+        whenever the server's own image does. Returns None when the server's own
+        image should be downloaded instead.
+        """
+        linked_state = f"{SHARED_STATE_PREFIX}{version}|"
+        if output_path.exists() and not (state or '').startswith(SHARED_STATE_PREFIX):
+            # The server's own artwork, keep checking it against the server
+            return None
+        if state and not state.startswith(linked_state):
+            # Linked before, but the server's own image changed since
+            return None
+
+        source_path = self.find(media_info, media_type, kind, output_path)
+        if source_path is None:
+            return None
+
+        try:
+            if output_path.exists():
+                if os.path.samefile(source_path, output_path):
+                    return state
+                output_path.unlink(missing_ok=True)
+            try:
+                os.link(source_path, output_path)
+            except OSError:
+                shutil.copyfile(source_path, output_path)
+        except OSError as e:
+            logger.error("Error linking shared artwork %s: %s", source_path, e)
+            return None
+        self.set_permissions(output_path)
+
+        # Identifies the linked file, so previews are refreshed when the source changes
+        stat = source_path.stat()
+        return f"{linked_state}{stat.st_ino}:{stat.st_size}:{int(stat.st_mtime)}"
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+import logging
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Minimum number of seconds between two progress lines of the same loop
+PROGRESS_INTERVAL = 30.0
+
+def setup_logging(level="INFO"):
+    """Configure logging for a script run, writing to stdout so cron captures it"""
+    logging.basicConfig(
+        level=getattr(logging, str(level).upper(), logging.INFO),
+        format=LOG_FORMAT,
+        datefmt=LOG_DATE_FORMAT,
+        stream=sys.stdout
+    )
+    # Connection pool chatter from requests is never useful in the cron log
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+
+def format_duration(seconds):
+    """Format a number of seconds as h:mm:ss or m:ss"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+class ProgressReporter:
+    """Rate-limited progress logging for a loop over a known number of items"""
+
+    def __init__(self, logger, label, total, interval=PROGRESS_INTERVAL):
+        self.logger = logger
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.start = self.last_report = time.monotonic()
+
+    def update(self, count=1):
+        """Count processed items, logging progress at most once per interval"""
+        self.done += count
+        now = time.monotonic()
+        if now - self.last_report >= self.interval and self.done < self.total:
+            self.last_report = now
+            elapsed = now - self.start
+            rate = self.done / elapsed if elapsed else 0.0
+            eta = format_duration((self.total - self.done) / rate) if rate else "unknown"
+            self.logger.info("%s: %d/%d items (%.1f items/s, ETA %s)",
+                             self.label, self.done, self.total, rate, eta)
+
+    def finish(self, **counts):
+        """Log a one-line summary of the loop with optional extra counters"""
+        elapsed = time.monotonic() - self.start
+        rate = self.done / elapsed if elapsed else 0.0
+        details = "".join(f", {value} {name.replace('_', ' ')}" for name, value in counts.items())
+        self.logger.info("%s: %d items in %s (%.1f items/s)%s",
+                         self.label, self.done, format_duration(elapsed), rate, details)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import json
+import logging
+from pathlib import Path
+
+logger = logging.getLogger("glimpse.priority")
+
+# Number of newest items whose posters are fetched before the first catalog publish
+DEFAULT_PRIORITY_ITEMS = 200
+
+# Catalog files and the media type their items belong to
+CATALOG_FILES = {
+    'movie': 'movies.json',
+    'tvshow': 'tvshows.json'
+}
+
+def split_catalog(entries):
+    """Split (item, media type, media info) entries into movie and TV show records"""
+    movies_data = []
+    tvshows_data = []
+    for _, media_type, media_info in entries:
+        if media_type == 'movie':
+            movies_data.append(media_info)
+        else:
+            tvshows_data.append(media_info)
+    return movies_data, tvshows_data
+
+def carry_over_enrichment(records, output_dir, fields):
+    """Copy enrichment fields from the previously published catalog onto listing-only records.
+
+    Without this, the first milestones of a prioritized sync would replace the
+    cast or episode counts of every known title with the sparser listing data
+    until the enrichment phase catches up.
+    """
+    previous = {}
+    for file_name in CATALOG_FILES.values():
+        path = Path(output_dir) / file_name
+        if not path.exists():
+            continue
+        try:
+            with open(path, 'r') as f:
+                previous.update((str(record.get('id', '')), record) for record in json.load(f))
+        except (OSError, ValueError) as e:
+            logger.warning("Could not load previous catalog %s: %s", path, e)
+
+    carried = 0
+    for record in records:
+        old_record = previous.get(record['id'])
+        if not old_record:
+            continue
+        for field in fields:
+            if old_record.get(field):
+                record[field] = old_record[field]
+        carried += 1
+
+    logger.debug("Carried enrichment of %d known titles over from the previous catalog", carried)
+    return carried
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+import io
+import time
+import pstats
+import logging
+import cProfile
+import tracemalloc
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+from collections import Counter
+
+logger = logging.getLogger("glimpse.profiler")
+
+# Number of functions and allocation sites listed per phase in the text report
+REPORT_TOP_FUNCTIONS = 20
+REPORT_TOP_ALLOCATIONS = 10
+
+def format_size(size):
+    """Format a byte count as a short human readable string"""
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+class PhaseStats:
+    """cProfile data and memory measurements collected for one sync phase"""
+
+    def __init__(self, name):
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.entries = 0
+        self.wall_time = 0.0
+        self.peak_memory = 0
+        self.allocations = Counter()
+        # Time spent in nested phases and pauses during the current entry
+        self.excluded = 0.0
+
+class SyncProfiler:
+    """Per-phase cProfile and tracemalloc recording for a fetcher run.
+
+    A phase may be entered many times (once per library, say); its measurements
+    accumulate. A phase entered inside another one takes over the profiling until
+    it ends: its time is not counted in the outer phase, but its allocation sites
+    and peak memory are only measured for the outermost phase, as snapshots are
+    too slow to take per item. Rate-limit pauses are not counted in any phase.
+    """
+
+    def __init__(self, output_dir=None, enabled=False, set_permissions=None):
+        self.enabled = enabled
+        self.output_dir = Path(output_dir) if output_dir else None
+        self.set_permissions = set_permissions
+        self.phases = {}
+        self.stack = []
+        self.paused = 0.0
+        self.start = time.perf_counter()
+        if self.enabled:
+            tracemalloc.start()
+
+    @staticmethod
+    def take_snapshot():
+        """Take a tracemalloc snapshot without the profiler's own bookkeeping"""
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+    @contextmanager
+    def phase(self, name):
+        """Record everything run inside the block under the given phase"""
+        if not self.enabled or any(stats.name == name for stats in self.stack):
+            yield
+            return
+
+        stats = self.phases.setdefault(name, PhaseStats(name))
+        outer = self.stack[-1] if self.stack else None
+        if outer:
+            outer.profile.disable()
+        else:
+            tracemalloc.reset_peak()
+            before = self.take_snapshot()
+        self.stack.append(stats)
+        stats.excluded = 0.0
+        start = time.perf_counter()
+        stats.profile.enable()
+        try:
+            yield
+        finally:
+            stats.profile.disable()
+            elapsed = time.perf_counter() - start
+            stats.wall_time += elapsed - stats.excluded
+            stats.entries += 1
+            stats.peak_memory = max(stats.peak_memory, tracemalloc.get_traced_memory()[1])
+            self.stack.pop()
+            if outer:
+                outer.excluded += elapsed
+                outer.profile.enable()
+            else:
+                after = self.take_snapshot()
+                for diff in after.compare_to(before, 'lineno'):
+                    if diff.size_diff > 0:
+                        frame = diff.traceback[0]
+                        stats.allocations[f"{frame.filename}:{frame.lineno}"] += diff.size_diff
+
+    def pause(self, seconds):
+        """Sleep to spare the server, keeping the pause out of the active phase"""
+        if not self.enabled:
+            time.sleep(seconds)
+            return
+
+        active = self.stack[-1] if self.stack else None
+        if active:
+            active.profile.disable()
+        start = time.perf_counter()
+        time.sleep(seconds)
+        elapsed = time.perf_counter() - start
+        self.paused += elapsed
+        if active:
+            active.excluded += elapsed
+            active.profile.enable()
+
+    def build_report(self):
+        """Return the text report of all recorded phases"""
+        total_time = time.perf_counter() - self.start
+        lines = [
+            f"Sync profile - {datetime.now().isoformat(timespec='seconds')}",
+            f"Total run time: {total_time:.2f}s, peak traced memory: {format_size(tracemalloc.get_traced_memory()[1])}",
+            "",
+            f"{'Phase':<14} {'Entries':>8} {'Wall (s)':>10} {'Share':>7} {'Peak memory':>12}"
+        ]
+        for stats in self.phases.values():
+            share = stats.wall_time / total_time if total_time else 0.0
+            lines.append(f"{stats.name:<14} {stats.entries:>8} {stats.wall_time:>10.2f} {share:>7.1%} "
+                         f"{format_size(stats.peak_memory):>12}")
+        if self.paused:
+            share = self.paused / total_time if total_time else 0.0
+            lines.append(f"{'(pauses)':<14} {'':>8} {self.paused:>10.2f} {share:>7.1%} {'':>12}")
+
+        for stats in self.phases.values():
+            lines += ["", f"=== Phase: {stats.name} ===", "", f"Top {REPORT_TOP_FUNCTIONS} functions by cumulative time:"]
+            stream = io.StringIO()
+            pstats.Stats(stats.profile, stream=stream).strip_dirs().sort_stats('cumulative').print_stats(REPORT_TOP_FUNCTIONS)
+            # Skip the pstats preamble, the table starts at its column header
+            table = stream.getvalue().splitlines()
+            header = next((i for i, line in enumerate(table) if 'ncalls' in line), 0)
+            lines += [line for line in table[header:] if line.strip()]
+
+            lines += ["", f"Top {REPORT_TOP_ALLOCATIONS} allocation sites (memory still held at phase end):"]
+            if not stats.allocations:
+                lines.append("  (none)")
+            for site, size in stats.allocations.most_common(REPORT_TOP_ALLOCATIONS):
+                lines.append(f"  {format_size(size):>10}  {site}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_report(self):
+        """Write per-phase .pstats files and the text report, returning the report path"""
+        if not self.enabled or not self.phases:
+            return None
+
+        profile_dir = self.output_dir / "profile"
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+
+        for stats in self.phases.values():
+            stats.profile.dump_stats(str(profile_dir / f"{stamp}-{stats.name}.pstats"))
+
+        report_path = profile_dir / f"{stamp}-report.txt"
+        with open(report_path, 'w') as f:
+            f.write(self.build_report())
+
+        if self.set_permissions:
+            self.set_permissions(profile_dir)
+            for path in profile_dir.glob(f"{stamp}-*"):
+                self.set_permissions(path)
+
+        tracemalloc.stop()
+        logger.info("Profile written to: %s (view a phase with: python -m pstats %s)",
+                    report_path, profile_dir / f"{stamp}-<phase>.pstats")
+        return report_path
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+
+import json
+import time
+import logging
+from pathlib import Path
+from sync_logging import format_duration
+from sync_priority import CATALOG_FILES
+from catalog_publisher import IMAGE_REFS_FILE
+
+logger = logging.getLogger("glimpse.recovery")
+
+# Last complete listing of every library, written next to the catalogs
+LIBRARY_STATE_FILE = "libraries.json"
+
+# Seconds to wait before each retry of the libraries that failed in a run
+DEFAULT_RETRY_DELAYS = "30,90"
+
+# Retries wait this many seconds in total at most, so a run ends well before the next
+# scheduled one; libraries still failing then are picked up by that run
+MAX_RETRY_WAIT = 240
+
+# State key of the combined listing of all libraries (Jellyfin/Emby without exclusions)
+ALL_LIBRARIES = "all"
+
+class IncompleteLibraryError(Exception):
+    """A library listing failed part way through or came back shorter than the server reported.
+
+    items holds whatever was listed before the failure.
+    """
+
+    def __init__(self, message, items=None):
+        super().__init__(message)
+        self.items = items or []
+
+def parse_retry_delays(value):
+    """Parse a comma-separated list of retry delays in seconds, 'off' or empty for no retries"""
+    if value.strip().lower() in ('', 'off'):
+        return []
+    return [float(delay) for delay in value.split(',') if delay.strip()]
+
+def check_listing(items, total, label):
+    """Raise IncompleteLibraryError if a listing holds fewer items than the server reported"""
+    if total is not None and len(items) < total:
+        raise IncompleteLibraryError(f"{label}: listed {len(items)} of {total} items", items)
+
+class LibraryState:
+    """Sync libraries one at a time, standing in last-good data for the ones that fail.
+
+    Every library whose listing is complete is recorded in libraries.json with the
+    IDs of the records it produced. When a library fails on a later run, those
+    records are taken from the previously published catalog (together with their
+    image references in lazy mode) instead of publishing a truncated library, and
+    only the failed libraries are retried after a backoff.
+
+    With a LibrarySchedule, libraries whose refresh interval has not passed yet
+    keep their records from the previous catalog the same way, without being
+    listed at all.
+
+    Libraries are (name, media type, key) tuples; entries are the
+    (item, media type, media info) tuples of split_catalog, with a None item for
+    records taken from the previous catalog.
+
+    Jellyfin/Emby list all libraries together (state key "all") unless libraries
+    are excluded or scheduled. After switching between the two, a failing library
+    stands in with records derived from the other kind of state (see inherited_state).
+    """
+
+    def __init__(self, output_dir, image_refs, schedule=None):
+        self.output_dir = Path(output_dir)
+        self.image_refs = image_refs
+        self.schedule = schedule
+        # Start of this run, recorded as the sync time of every library completed in it
+        self.started = time.time()
+        self.previous = self.load_json(LIBRARY_STATE_FILE) or {}
+        self.libraries = {}  # state key -> state of the library in the catalog being built
+        self.entries = {}  # state key -> entries, in library order
+        self.previous_records = None  # (media type, id) -> record of the previous catalog, loaded on first fallback
+        self.previous_refs = None
+
+    def load_json(self, name):
+        """Load a JSON file published by the previous run, or None"""
+        path = self.output_dir / name
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not load %s: %s", path, e)
+            return None
+
+    @staticmethod
+    def state_key(key):
+        return str(key) if key else ALL_LIBRARIES
+
+    def all_entries(self):
+        """Return the entries of all libraries in library order.
+
+        A record standing in from the previous catalog is left out when a library
+        listed in this run, or an earlier stand-in, holds the same title: stand-ins
+        derived from the combined listing may include titles of other libraries.
+        """
+        entries = [entry for entries in self.entries.values() for entry in entries]
+        seen = {(media_type, media_info['id']) for item, media_type, media_info in entries if item is not None}
+        unique = []
+        for item, media_type, media_info in entries:
+            if item is None:
+                if (media_type, media_info['id']) in seen:
+                    continue
+                seen.add((media_type, media_info['id']))
+            unique.append((item, media_type, media_info))
+        return unique
+
+    def record_complete(self, key, name, entries):
+        """Remember the records of a library whose listing was complete"""
+        ids = {media_type: [] for media_type in CATALOG_FILES}
+        for _, media_type, media_info in entries:
+            ids[media_type].append(media_info['id'])
+        self.libraries[key] = {'name': name, 'syncedAt': self.started, 'ids': ids}
+        self.entries[key] = entries
+
+    def inherited_state(self, key, name, media_type):
+        """Derive a library's state from a last complete sync that listed libraries the other way, or None.
+
+        The combined listing takes the records of all libraries listed one by one.
+        A library listed on its own takes all combined records of its media type,
+        since the combined listing does not say which library a title is in;
+        all_entries drops the ones another library lists in this run.
+        """
+        if key == ALL_LIBRARIES:
+            states = [state for state_key, state in self.previous.items() if state_key != ALL_LIBRARIES]
+            if not states:
+                return None
+            ids = {media_type: list(dict.fromkeys(record_id for state in states
+                                                  for record_id in state['ids'].get(media_type, [])))
+                   for media_type in CATALOG_FILES}
+            return {'name': name, 'syncedAt': min(state['syncedAt'] for state in states), 'ids': ids}
+
+        combined = self.previous.get(ALL_LIBRARIES)
+        if not combined or media_type not in CATALOG_FILES:
+            return None
+        ids = {other_type: [] for other_type in CATALOG_FILES}
+        ids[media_type] = list(combined['ids'].get(media_type, []))
+        return {'name': name, 'syncedAt': combined['syncedAt'], 'ids': ids}
+
+    def fall_back(self, key, name, media_type=None):
+        """Use a library's records from the previous catalog, returning False if it has none"""
+        state = self.previous.get(key) or self.inherited_state(key, name, media_type)
+        if not state:
+            return False
+
+        if self.previous_records is None:
+            self.previous_records = {}
+            for media_type, file_name in CATALOG_FILES.items():
+                for record in self.load_json(file_name) or []:
+                    self.previous_records[(media_type, str(record.get('id', '')))] = record
+            self.previous_refs = self.load_json(IMAGE_REFS_FILE) or {}
+
+        entries = []
+        for media_type, ids in state['ids'].items():
+            for record_id in ids:
+                record = self.previous_records.get((media_type, record_id))
+                if not record:
+                    continue
+                entries.append((None, media_type, record))
+
+                # Lazily loaded images keep resolving through the image proxy
+                for kind in ('posters', 'backdrops'):
+                    path = f"{kind}/{media_type}s/{record_id}.jpg"
+                    if path in self.previous_refs:
+                        self.image_refs.setdefault(path, self.previous_refs[path])
+
+        # Keep the old state so the library can stand in again if the next run fails as well
+        self.libraries[key] = state
+        self.entries[key] = entries
+        return True
+
+    def keep_until_due(self, library):
+        """Keep a library's previous records if its refresh interval has not passed yet"""
+        name, media_type, library_key = library
+        key = self.state_key(library_key)
+        due_at = self.schedule.next_sync(name, library_key, self.previous.get(key), self.started)
+        if due_at is None or not self.fall_back(key, name, media_type):
+            return False
+        logger.info("Library '%s' is not due until %s, keeping its %d titles",
+                    name, self.schedule.format_time(due_at), len(self.entries[key]))
+        return True
+
+    def sync_library(self, library, list_items, process_items):
+        """List and process one library, returning False if its listing was incomplete"""
+        name, media_type, library_key = library
+        key = self.state_key(library_key)
+        try:
+            items = list_items(library)
+        except IncompleteLibraryError as e:
+            logger.error("Library '%s' could not be listed completely: %s", name, e)
+            if self.fall_back(key, name, media_type):
+                logger.warning("Library '%s' keeps its %d titles from the last complete sync", name, len(self.entries[key]))
+            else:
+                # Nothing to fall back to - a partial library beats an empty one, but is not recorded as good
+                logger.warning("No complete sync of library '%s' to fall back to, using %d listed items",
+                               name, len(e.items))
+                self.entries[key] = process_items(name, media_type, e.items)
+            return False
+
+        self.record_complete(key, name, process_items(name, media_type, items))
+        return True
+
+    def sync(self, libraries, list_items, process_items):
+        """Sync all libraries that are due, returning the ones that failed"""
+        failed = []
+        for library in libraries:
+            if self.schedule and self.keep_until_due(library):
+                continue
+            if not self.sync_library(library, list_items, process_items):
+                failed.append(library)
+        return failed
+
+    def retry(self, failed, delays, list_items, process_items, publish):
+        """Retry failed libraries after each delay, publishing whenever one recovers.
+
+        Delays beyond MAX_RETRY_WAIT in total are skipped. Returns the libraries
+        that still failed after the last retry.
+        """
+        budget = MAX_RETRY_WAIT
+        for attempt, delay in enumerate(delays, 1):
+            if not failed:
+                break
+            if delay > budget:
+                logger.warning("Retry delays are capped at %s in total, leaving %d failed libraries to the next run",
+                               format_duration(MAX_RETRY_WAIT), len(failed))
+                break
+            budget -= delay
+            logger.info("Retrying %d failed libraries in %s (attempt %d of %d)",
+                        len(failed), format_duration(delay), attempt, len(delays))
+            time.sleep(delay)
+
+            still_failed = []
+            for library in failed:
+                if self.sync_library(library, list_items, process_items):
+                    logger.info("Library '%s' recovered", library[0])
+                else:
+                    still_failed.append(library)
+
+            if len(still_failed) < len(failed):
+                publish()
+            failed = still_failed
+
+        if failed:
+            logger.error("Libraries still incomplete after all retries: %s",
+                         ', '.join(library[0] for library in failed))
+        return failed
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import re
+import time
+import logging
+from sync_logging import LOG_DATE_FORMAT
+
+logger = logging.getLogger("glimpse.schedule")
+
+# Units of refresh intervals, e.g. 30m, 6h, 7d
+INTERVAL_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+INTERVAL_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)([smhdw]?)$')
+
+# A library counts as due this many seconds early, so a scheduled run starting
+# slightly before the interval is up does not skip it until the run after
+DUE_TOLERANCE = 300
+
+def parse_interval(value):
+    """Parse a refresh interval like 90, 30m, 6h or 7d into seconds"""
+    match = INTERVAL_PATTERN.match(value.strip().lower())
+    if not match:
+        raise ValueError(f"Invalid interval '{value.strip()}', expected e.g. 30m, 6h or 7d")
+    return float(match.group(1)) * INTERVAL_UNITS[match.group(2) or 's']
+
+def parse_library_intervals(value):
+    """Parse comma-separated <library>=<interval> pairs, libraries given by name or ID"""
+    intervals = {}
+    for entry in value.split(','):
+        if not entry.strip():
+            continue
+        library, separator, interval = entry.rpartition('=')
+        if not separator or not library.strip():
+            raise ValueError(f"Invalid library interval '{entry.strip()}', expected <library>=<interval>")
+        intervals[library.strip()] = parse_interval(interval)
+    return intervals
+
+class LibrarySchedule:
+    """Refresh intervals of individual libraries, matched by name or ID like library exclusions.
+
+    A library with an interval is only synced once its interval has passed
+    since its last complete sync; libraries without one are synced on every run.
+    """
+
+    def __init__(self, intervals=None):
+        self.intervals = dict(intervals or {})
+
+    def __bool__(self):
+        return bool(self.intervals)
+
+    def interval(self, name, key):
+        """Return the refresh interval of a library in seconds, or None"""
+        if name in self.intervals:
+            return self.intervals[name]
+        return self.intervals.get(str(key)) if key else None
+
+    def next_sync(self, name, key, state, now=None):
+        """Return when a library is due again, or None if it is due now.
+
+        state is the library's entry in libraries.json; a library that never
+        completed a sync is always due.
+        """
+        interval = self.interval(name, key)
+        synced_at = (state or {}).get('syncedAt')
+        if interval is None or synced_at is None:
+            return None
+        due_at = synced_at + interval
+        now = time.time() if now is None else now
+        return due_at if due_at - DUE_TOLERANCE > now else None
+
+    @staticmethod
+    def format_time(timestamp):
+        return time.strftime(LOG_DATE_FORMAT, time.localtime(timestamp))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import shutil
+import unittest
+import subprocess
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "scripts"))
+
+from catalog_publisher import CatalogPublisher
+from columnar_catalog import encode_catalog, decode_catalog
+
+INDEX_HTML = ROOT_DIR / "web" / "index.html"
+
+# Parts of the UI that decode columnar catalogs, extracted from index.html for node
+UI_DECODER = ('const COLUMNAR_VERSION', 'function decodeDeltas(', 'function decodeColumnarCatalog(')
+
+# Records the way the fetchers and the merge write them, plus every case the encoding
+# has to fall back for: missing keys, None, wrong types, nested lists and repeated strings
+RECORDS = [
+    {
+        'id': '101', 'title': 'Northwind', 'year': 1999, 'rating': 7.5, 'studio': 'Blue Harbor',
+        'contentRating': 'PG-13', 'genres': ['Drama', 'Thriller'], 'addedAt': 1600000000,
+        'updatedAt': 1600003600, 'actors': [{'name': 'A. Actor', 'role': 'Lead'}],
+        'providerIds': {'imdb': 'tt0000101'}
+    },
+    {
+        'id': '102', 'title': 'Silverline', 'year': '', 'rating': '', 'studio': 'Blue Harbor',
+        'contentRating': 'PG-13', 'genres': ['Drama'], 'addedAt': '', 'updatedAt': 1600007200,
+        'actors': [], 'providerIds': {}
+    },
+    {
+        'id': '103', 'title': 'Kestrel', 'studio': None, 'contentRating': None, 'genres': None,
+        'addedAt': None, 'leafCount': 24, 'childCount': 2, 'sources': [{'server': 'plex', 'id': '103'}]
+    },
+    {
+        'id': '104', 'title': 'Ørbit – Ñame', 'studio': 42, 'genres': ['Comedy', 7, None],
+        'addedAt': True, 'updatedAt': 1.5, 'tags': [[1, 2], [], ['a', [None]]]
+    },
+    {
+        'id': '105', 'title': 'Blue Harbor', 'studio': 'Blue Harbor', 'contentRating': 'R', 'genres': [],
+        'addedAt': 1500000000, 'updatedAt': 1500000000, 'tagline': None
+    },
+    {}
+]
+
+def json_round_trip(document):
+    """Return a document as the UI receives it"""
+    return json.loads(CatalogPublisher.encode_json(document))
+
+def extract_ui_decoder():
+    """Return the JavaScript of the UI's columnar decoder"""
+    html = INDEX_HTML.read_text(encoding='utf-8')
+    parts = []
+    for start in UI_DECODER:
+        position = html.index(start)
+        if start.startswith('const'):
+            parts.append(html[position:html.index(';', position) + 1])
+            continue
+        depth = 0
+        for end in range(html.index('{', position), len(html)):
+            depth += {'{': 1, '}': -1}.get(html[end], 0)
+            if depth == 0:
+                break
+        parts.append(html[position:end + 1])
+    return "\n".join(parts)
+
+def decode_in_ui(document):
+    """Decode a columnar catalog with the UI's decoder in node"""
+    script = extract_ui_decoder() + """
+const input = require('fs').readFileSync(0, 'utf-8');
+process.stdout.write(JSON.stringify(decodeColumnarCatalog(JSON.parse(input))));
+"""
+    result = subprocess.run(['node', '-e', script], input=CatalogPublisher.encode_json(document),
+                            capture_output=True, check=True)
+    return json.loads(result.stdout)
+
+class ColumnarCatalogTest(unittest.TestCase):
+    def test_round_trip(self):
+        document = json_round_trip(encode_catalog(RECORDS))
+        self.assertEqual(decode_catalog(document), RECORDS)
+
+    def test_empty_catalog(self):
+        self.assertEqual(decode_catalog(json_round_trip(encode_catalog([]))), [])
+
+    def test_repeated_strings_are_stored_once(self):
+        columns = {column['field']: column for column in encode_catalog(RECORDS)['columns']}
+        self.assertEqual(columns['studio']['encoding'], 'strings')
+        self.assertEqual(columns['studio']['strings'][0], 'Blue Harbor')
+        self.assertEqual(columns['studio']['strings'].count('Blue Harbor'), 1)
+        self.assertIn([3, 42], columns['studio']['raw'])
+
+    @unittest.skipUnless(shutil.which('node'), "node is not installed")
+    def test_ui_decoder_matches(self):
+        document = json_round_trip(encode_catalog(RECORDS))
+        self.assertEqual(decode_in_ui(document), RECORDS)
+
+    @unittest.skipUnless(shutil.which('node'), "node is not installed")
+    def test_ui_decoder_rejects_other_versions(self):
+        document = json_round_trip(encode_catalog(RECORDS))
+        document['version'] += 1
+        self.assertIsNone(decode_in_ui(document))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,10 @@
 // Service Worker for Glimpse Media Viewer
 
-const CACHE_NAME = "glimpse-media-viewer-v7.3";
-const DYNAMIC_CACHE = "glimpse-media-dynamic-v7.3";
+const CACHE_NAME = "glimpse-media-viewer-v7.5";
+const DYNAMIC_CACHE = "glimpse-media-dynamic-v7.5";
+
+// Content-versioned catalog files published by the fetchers, e.g. movies.0123456789ab.json
+const VERSIONED_DATA_PATTERN = /^(.*\/[^/]+)\.[0-9a-f]{12}\.json$/;
 
 // Assets to cache on install (excluding HTML files that might have themes)
 const STATIC_ASSETS = ["/manifest.json", "/test.html"];
@@ -57,7 +60,7 @@ function isThemedHtmlRequest(request) {
   const url = new URL(request.url);
   const pathname = url.pathname;
 
-  // Main index, plex route, jellyfin route, or emby route - these have themes
+  // Main index and the plex, jellyfin, emby and merged routes - these have themes
   return (
     pathname === "/" ||
     pathname === "/index.html" ||
@@ -66,7 +69,9 @@ function isThemedHtmlRequest(request) {
     pathname === "/jellyfin/" ||
     pathname === "/jellyfin/index.html" ||
     pathname === "/emby/" ||
-    pathname === "/emby/index.html"
+    pathname === "/emby/index.html" ||
+    pathname === "/merged/" ||
+    pathname === "/merged/index.html"
   );
 }
 
@@ -75,6 +80,19 @@ function isJsonDataRequest(request) {
   return request.url.includes("/data/") && request.url.endsWith(".json");
 }
 
+// Check if request is for the small version manifest listing the current catalogs
+function isDataManifestRequest(request) {
+  return request.url.includes("/data/") && request.url.endsWith("/version.json");
+}
+
+// Check if request is for a content-versioned catalog file (immutable once published)
+function isVersionedDataRequest(request) {
+  return (
+    request.url.includes("/data/") &&
+    VERSIONED_DATA_PATTERN.test(new URL(request.url).pathname)
+  );
+}
+
 // Check if request is for image files (these can be cached more aggressively)
 function isImageDataRequest(request) {
   return request.url.includes("/data/") && request.url.endsWith(".jpg");
@@ -98,7 +116,19 @@ self.addEventListener("fetch", (event) => {
     return;
   }
 
-  // JSON data files - always fetch fresh (no caching)
+  // Version manifest - always ask the network, keep a copy for offline use
+  if (isDataManifestRequest(event.request)) {
+    event.respondWith(dataManifestStrategy(event.request));
+    return;
+  }
+
+  // Versioned catalogs never change - serve them from Cache Storage
+  if (isVersionedDataRequest(event.request)) {
+    event.respondWith(versionedDataStrategy(event.request));
+    return;
+  }
+
+  // Other JSON data files - always fetch fresh (no caching)
   if (isJsonDataRequest(event.request)) {
     event.respondWith(alwaysFreshStrategy(event.request));
     return;
@@ -146,6 +176,51 @@ async function alwaysFreshStrategy(request) {
   }
 }
 
+// Network-first strategy for the version manifest, falling back to the last copy seen
+async function dataManifestStrategy(request) {
+  const cache = await caches.open(DYNAMIC_CACHE);
+  try {
+    const response = await fetch(request, { cache: "no-cache" });
+    if (response.ok) {
+      cache.put(request, response.clone());
+      return response;
+    }
+    const cachedResponse = await cache.match(request);
+    return cachedResponse || response;
+  } catch (error) {
+    console.log("Network error for data manifest, trying cache:", request.url);
+    const cachedResponse = await cache.match(request);
+    if (cachedResponse) {
+      return cachedResponse;
+    }
+    throw error;
+  }
+}
+
+// Cache-first strategy for content-versioned catalogs, dropping superseded versions
+async function versionedDataStrategy(request) {
+  const cache = await caches.open(DYNAMIC_CACHE);
+  const cachedResponse = await cache.match(request);
+  if (cachedResponse) {
+    console.log("Serving cached catalog version:", request.url);
+    return cachedResponse;
+  }
+
+  const response = await fetch(request);
+  if (response.ok) {
+    const catalogPath = new URL(request.url).pathname.match(VERSIONED_DATA_PATTERN)[1];
+    const keys = await cache.keys();
+    for (const key of keys) {
+      const match = new URL(key.url).pathname.match(VERSIONED_DATA_PATTERN);
+      if (match && match[1] === catalogPath) {
+        await cache.delete(key);
+      }
+    }
+    await cache.put(request, response.clone());
+  }
+  return response;
+}
+
 // Stale-while-revalidate strategy for images
 async function staleWhileRevalidateStrategy(request) {
   const cache = await caches.open(DYNAMIC_CACHE);
@@ -289,6 +364,8 @@ self.addEventListener("message", async (event) => {
       "/jellyfin/index.html",
       "/emby/",
       "/emby/index.html",
+      "/merged/",
+      "/merged/index.html",
     ];
 
     const cache = await caches.open(DYNAMIC_CACHE);